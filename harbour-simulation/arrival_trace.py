@@ -0,0 +1,137 @@
+import itertools
+
+import numpy as np
+
+# -------------------------
+# TRACE CONFIGURATION
+# -------------------------
+TRACE_CHUNK_ROWS = 65_536 # records parsed at once
+
+# Binary record layout (raw .bin files and structured .npy files)
+TRACE_DTYPE = np.dtype([
+    ('arrival_time', '<f8'), # (hours since simulation start)
+    ('priority', '<i8'), # 0: ship, -1: special ship
+    ('fuel_capacity', '<i8'),
+    ('fuel_level', '<i8'),
+])
+
+
+def read_trace(path: str, chunk_rows: int = TRACE_CHUNK_ROWS):
+    """Lazily yields (arrival_time, priority, fuel_capacity, fuel_level) records of a schedule.
+
+    CSV files (columns in TRACE_DTYPE order, optional header) are parsed one chunk at
+    a time, .npy and raw .bin files are memory-mapped and sliced. Records must be sorted
+    by arrival time, fuel levels are clipped into [0, fuel_capacity].
+
+    :param <path>: path of a .csv, .npy or .bin schedule
+    :param <chunk_rows>: number of records converted at once
+    """
+
+    for chunk in iter_trace_chunks(path, chunk_rows):
+        yield from zip(
+            chunk['arrival_time'].tolist(),
+            chunk['priority'].tolist(),
+            chunk['fuel_capacity'].tolist(),
+            chunk['fuel_level'].tolist())
+
+
+def iter_trace_chunks(path: str, chunk_rows: int = TRACE_CHUNK_ROWS):
+    """Yields a schedule as structured arrays (TRACE_DTYPE) of at most <chunk_rows> records.
+
+    Raises ValueError on records with an invalid or decreasing arrival time, an unknown
+    priority or a negative fuel capacity.
+
+    :param <path>: path of a .csv, .npy or .bin schedule
+    :param <chunk_rows>: number of records per chunk
+    """
+
+    if path.endswith('.csv'):
+        chunks = _iter_csv_chunks(path, chunk_rows)
+    else:
+        chunks = _iter_binary_chunks(path, chunk_rows)
+
+    start, previous = 0, 0.0
+    for chunk in chunks:
+        chunk = _check_chunk(chunk, path, start, previous)
+        if len(chunk):
+            previous = float(chunk['arrival_time'][-1])
+        yield chunk
+        start += len(chunk)
+
+
+def _iter_binary_chunks(path: str, chunk_rows: int):
+    if path.endswith('.npy'):
+        records = np.load(path, mmap_mode='r')
+        if records.dtype != TRACE_DTYPE:
+            raise ValueError(f'{path}: expected records of dtype {TRACE_DTYPE}')
+    else:
+        records = np.memmap(path, dtype=TRACE_DTYPE, mode='r')
+
+    for start in range(0, len(records), chunk_rows):
+        yield records[start:start + chunk_rows]
+
+
+def _iter_csv_chunks(path: str, chunk_rows: int):
+    with open(path) as f:
+        first = f.readline()
+        lines = f if _is_header(first) else itertools.chain([first], f)
+
+        while True:
+            block = list(itertools.islice(lines, chunk_rows))
+            if not block:
+                return
+
+            values = np.loadtxt(block, delimiter=',', ndmin=2)
+            chunk = np.empty(len(values), dtype=TRACE_DTYPE)
+            for i, name in enumerate(TRACE_DTYPE.names):
+                chunk[name] = values[:, i]
+            yield chunk
+
+
+def _check_chunk(chunk: np.ndarray, path: str, start: int, previous: float = 0.0) -> np.ndarray:
+    """Validates a chunk of records, clipping fuel levels into [0, fuel_capacity].
+
+    :param <chunk>: structured array (TRACE_DTYPE)
+    :param <path>: path of the schedule, for error messages
+    :param <start>: index of the first record of the chunk
+    :param <previous>: arrival time of the last record of the previous chunk
+    """
+
+    arrival_time = chunk['arrival_time']
+    invalid = (
+        ~np.isfinite(arrival_time) | (arrival_time < 0)
+        | (np.diff(arrival_time, prepend=previous) < 0)
+        | ~np.isin(chunk['priority'], (0, -1))
+        | (chunk['fuel_capacity'] < 0))
+    if invalid.any():
+        i = int(np.argmax(invalid))
+        raise ValueError(f'{path}: invalid record {start + i}: {chunk[i]}')
+
+    level, capacity = chunk['fuel_level'], chunk['fuel_capacity']
+    if (level < 0).any() or (level > capacity).any():
+        # Memory-mapped records are read-only
+        chunk = chunk.copy()
+        np.clip(level, 0, capacity, out=chunk['fuel_level'])
+
+    return chunk
+
+
+def _is_header(line: str) -> bool:
+    try:
+        float(line.split(',')[0])
+    except ValueError:
+        return True
+    return False
+
+
+def convert_trace(path: str, out_path: str, chunk_rows: int = TRACE_CHUNK_ROWS):
+    """Converts a schedule (e.g. a CSV) into a raw binary file that can be memory-mapped.
+
+    :param <path>: path of the source schedule
+    :param <out_path>: path of the .bin file to write
+    :param <chunk_rows>: number of records converted at once
+    """
+
+    with open(out_path, 'wb') as f:
+        for chunk in iter_trace_chunks(path, chunk_rows):
+            f.write(np.ascontiguousarray(chunk, dtype=TRACE_DTYPE).tobytes())
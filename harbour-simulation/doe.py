@@ -0,0 +1,218 @@
+import itertools
+import logging
+import multiprocessing
+
+import numpy as np
+from numpy.polynomial import legendre
+
+import main
+import objects.ship
+import objects.tug
+from logger import doe_logger
+from objects.fuel_barge import FuelBarge
+from recorder import summary
+
+# -------------------------
+# DOE CONFIGURATION
+# -------------------------
+DOE_DESIGN = 'lhs' # 'lhs' (Latin hypercube) or 'sobol' (requires scipy)
+DOE_SAMPLES = 256 # runs of the design
+DOE_PCE_DEGREE = 2 # total degree of the polynomial chaos emulator
+DOE_SIM_TIME = 120 # (hours in real world)
+DOE_SEED = 42
+DOE_WORKERS = multiprocessing.cpu_count()
+DOE_BATCH_SIZE = 4 # runs sent to a worker at once
+DOE_BOOTSTRAP = 1000 # resamples of the base samples for the confidence intervals
+DOE_CONFIDENCE = 0.95
+
+# Parameters: (name, owner, attribute, low, high, cast)
+PARAMETERS = [
+    ('CARGO_TIME_MEAN', main, 'CARGO_TIME_MEAN', 2, 6, float),
+    ('BUNKERING_TIME_MEAN', main, 'BUNKERING_TIME_MEAN', 1, 3, float),
+    ('DOCKING_TIME_MEAN', objects.tug, 'DOCKING_TIME_MEAN', 0.5, 1.5, float),
+    ('TUG_MAINTENANCE_FREQUENCY', objects.tug, 'TUG_MAINTENANCE_FREQUENCY', 12, 36, float),
+    ('FuelBarge.fuel_capacity', FuelBarge, 'fuel_capacity', 50_000, 150_000, int),
+    ('FUEL_CAPACITY_MAX', objects.ship, 'FUEL_CAPACITY_MAX', 10, 20, round),
+]
+
+# Responses: mean waiting time of each queue
+RESPONSES = ['ENTRANCE_WAIT', 'BUNKERING_WAIT', 'EXIT_WAIT']
+
+
+def unit_design(n: int, d: int, method: str, seed: int) -> np.ndarray:
+    """Generates <n> points in the unit hypercube of dimension <d>.
+
+    :param <n>: number of points
+    :param <d>: number of dimensions
+    :param <method>: 'lhs' or 'sobol'
+    :param <seed>: seed of the design generator
+    """
+
+    if method == 'lhs':
+        rng = np.random.default_rng(seed)
+        strata = np.argsort(rng.random((d, n)), axis=1).T
+        return (strata + rng.random((n, d))) / n
+
+    if method == 'sobol':
+        try:
+            from scipy.stats import qmc
+        except ImportError:
+            raise ImportError("DOE_DESIGN = 'sobol' requires scipy")
+        return qmc.Sobol(d, scramble=True, seed=seed).random(n)
+
+    raise ValueError(f'Unknown design method: {method}')
+
+
+def design(n: int, method: str = DOE_DESIGN, seed: int = DOE_SEED) -> tuple:
+    """Builds a space-filling design over the parameters.
+
+    :param <n>: number of points
+    :param <method>: 'lhs' or 'sobol'
+    :param <seed>: seed of the design generator
+    :return: tuple (points in the unit hypercube, points in parameters space), shape (n, d)
+    """
+
+    unit = unit_design(n, len(PARAMETERS), method, seed)
+
+    low = np.array([p[3] for p in PARAMETERS], dtype=float)
+    high = np.array([p[4] for p in PARAMETERS], dtype=float)
+    return unit, low + unit * (high - low)
+
+
+def evaluate(task) -> tuple:
+    """Runs a single simulation with the given parameters (worker side).
+
+    :param <task>: tuple (point, seed)
+    :return: mean waiting time of each queue
+    """
+
+    point, seed = task
+    for (_, owner, attribute, _, _, cast), value in zip(PARAMETERS, point):
+        setattr(owner, attribute, cast(value))
+
+    am = main.run_simulation(sim_time=DOE_SIM_TIME, seed=seed)
+    return tuple(summary(queue)[2] for queue in (
+        am.entrance_queue, am.bunkering_queue, am.exit_queue))
+
+
+def pce_terms(d: int, degree: int) -> np.ndarray:
+    """Multi-indices of the polynomial chaos terms of total degree in [1, degree].
+
+    :param <d>: number of dimensions
+    :param <degree>: maximum total degree
+    :return: array of shape (n_terms, d), the degree of each term in each dimension
+    """
+
+    return np.array([
+        m for m in itertools.product(range(degree + 1), repeat=d)
+        if 0 < sum(m) <= degree])
+
+
+def pce_basis(u: np.ndarray, terms: np.ndarray) -> np.ndarray:
+    """Orthonormal (shifted Legendre) basis of uniform inputs, with a leading constant column.
+
+    :param <u>: points in the unit hypercube, shape (n, d)
+    :param <terms>: multi-indices returned by <pce_terms>
+    """
+
+    degree = int(terms.max())
+    # polynomials[k, i]: Legendre polynomial of degree k of the i-th input, unit variance
+    polynomials = np.stack([
+        legendre.legval(2*u - 1, np.eye(degree + 1)[k]) * np.sqrt(2*k + 1)
+        for k in range(degree + 1)])
+
+    columns = np.prod(polynomials[terms.T, :, np.arange(u.shape[1])[:, None]], axis=0).T
+    return np.column_stack([np.ones(len(u)), columns])
+
+
+def sobol_indices(u: np.ndarray, y: np.ndarray, degree: int = DOE_PCE_DEGREE):
+    """Computes first-order and total indices from a polynomial chaos emulator.
+
+    The emulator is fitted by least squares on the design, its indices follow from
+    the coefficients: the variance of each term is its squared coefficient. Simulation
+    noise (not explained by the emulator) is left out of the variance.
+
+    :param <u>: design points in the unit hypercube, shape (n, d)
+    :param <y>: responses, shape (n,)
+    :param <degree>: total degree of the emulator
+    :return: tuple (first_order, total) of arrays of shape (d,)
+    """
+
+    d = u.shape[1]
+    terms = pce_terms(d, degree)
+    coefficients, *_ = np.linalg.lstsq(pce_basis(u, terms), y, rcond=None)
+
+    variances = coefficients[1:] ** 2
+    var = np.sum(variances)
+    if var == 0:
+        return np.zeros(d), np.zeros(d)
+
+    involved = terms > 0
+    alone = involved & (involved.sum(axis=1) == 1)[:, None]
+    return variances @ alone / var, variances @ involved / var
+
+
+def bootstrap_indices(
+    u: np.ndarray, y: np.ndarray, resamples: int = DOE_BOOTSTRAP, seed: int = DOE_SEED):
+    """Computes confidence intervals of the indices, refitting on design points resampled with replacement.
+
+    :param <u>: design points in the unit hypercube, shape (n, d)
+    :param <y>: responses, shape (n,)
+    :param <resamples>: number of bootstrap resamples
+    :param <seed>: seed of the resampling generator
+    :return: tuple (first_order, total) of arrays of shape (2, d), lower and upper bounds
+    """
+
+    rng = np.random.default_rng(seed)
+    n = len(y)
+
+    first_order, total = [], []
+    for _ in range(resamples):
+        rows = rng.integers(0, n, n)
+        s1, st = sobol_indices(u[rows], y[rows])
+        first_order.append(s1)
+        total.append(st)
+
+    alpha = (1 - DOE_CONFIDENCE) / 2
+    return (
+        np.quantile(first_order, [alpha, 1 - alpha], axis=0),
+        np.quantile(total, [alpha, 1 - alpha], axis=0))
+
+
+def run_doe(n: int = DOE_SAMPLES, method: str = DOE_DESIGN, workers: int = DOE_WORKERS):
+    """Evaluates the design in parallel batches and logs sensitivity indices.
+
+    :param <n>: number of runs
+    :param <method>: 'lhs' or 'sobol'
+    :param <workers>: number of worker processes
+    :return: dict response -> (first_order, total, first_order_ci, total_ci)
+    """
+
+    unit, points = design(n, method)
+    tasks = [(point, DOE_SEED + j) for j, point in enumerate(points)]
+
+    with multiprocessing.Pool(
+        workers,
+        initializer=logging.disable,
+        initargs=(logging.CRITICAL,)) as pool:
+        outputs = np.array(pool.map(evaluate, tasks, chunksize=DOE_BATCH_SIZE))
+
+    doe_logger.info(
+        f'[DESIGN]: {method}, {n} runs, emulator degree {DOE_PCE_DEGREE}, '
+        f'sim. time {DOE_SIM_TIME}, {DOE_CONFIDENCE:.0%} bootstrap CIs')
+    results = {}
+    for k, response in enumerate(RESPONSES):
+        first_order, total = sobol_indices(unit, outputs[:, k])
+        first_order_ci, total_ci = bootstrap_indices(unit, outputs[:, k])
+        results[response] = (first_order, total, first_order_ci, total_ci)
+        for i, (name, *_) in enumerate(PARAMETERS):
+            doe_logger.info(
+                f'[{response}]: {name}: '
+                f'S1: {first_order[i]:.3f} [{first_order_ci[0, i]:.3f}, {first_order_ci[1, i]:.3f}], '
+                f'ST: {total[i]:.3f} [{total_ci[0, i]:.3f}, {total_ci[1, i]:.3f}]')
+
+    return results
+
+
+if __name__ == '__main__':
+    run_doe()
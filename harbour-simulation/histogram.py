@@ -0,0 +1,196 @@
+import math
+import struct
+import zlib
+
+import numpy as np
+
+# -------------------------
+# HISTOGRAM CONFIGURATION
+# -------------------------
+HISTOGRAM_UNIT = 1e-4 # (hours, i.e. 0.36 seconds)
+HISTOGRAM_HIGHEST = 10_000 # (hours)
+HISTOGRAM_SIGNIFICANT_DIGITS = 3
+
+# Serialized header: unit, highest, digits, count, sum, min, max
+HEADER = struct.Struct('<ddiqddd')
+
+
+class WaitHistogram:
+    """Fixed-size, high-dynamic-range histogram of waiting times (HdrHistogram layout).
+
+    Values are bucketed with <digits> significant digits between <unit> and <highest>,
+    so two histograms with the same configuration merge by adding their counts.
+    """
+
+    # Attributes
+    unit: float
+    highest: float
+    digits: int
+    count: int
+    sum: float
+
+    def __init__(
+        self,
+        unit: float = HISTOGRAM_UNIT,
+        highest: float = HISTOGRAM_HIGHEST,
+        digits: int = HISTOGRAM_SIGNIFICANT_DIGITS):
+        """Initializes the class.
+
+        :param <unit>: smallest distinguishable value
+        :param <highest>: highest trackable value (larger ones are clamped)
+        :param <digits>: significant decimal digits kept for each value
+        """
+
+        self.unit = unit
+        self.highest = highest
+        self.digits = digits
+
+        # Sub-buckets: linear part of the layout, holding 2*10^digits values
+        self.half_magnitude = max(math.ceil(math.log2(2 * 10**digits)) - 1, 0)
+        self.half_count = 1 << self.half_magnitude
+        self.sub_bucket_mask = (1 << (self.half_magnitude + 1)) - 1
+
+        # Buckets: exponential part of the layout, covering <highest>
+        self.highest_ticks = math.ceil(highest / unit)
+        bucket_count = 1
+        while (self.sub_bucket_mask + 1) << (bucket_count - 1) <= self.highest_ticks:
+            bucket_count += 1
+
+        self.counts = np.zeros((bucket_count + 1) * self.half_count, dtype=np.int64)
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def __len__(self):
+        return self.count
+
+    def record(self, value: float):
+        """Record a value.
+
+        :param <value>: value to record (e.g. a waiting time)
+        """
+
+        ticks = min(max(int(value / self.unit), 0), self.highest_ticks)
+        self.counts[self._index(ticks)] += 1
+
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def record_many(self, values):
+        """Record a block of values at once.
+
+        :param <values>: array of values to record
+        """
+
+        values = np.asarray(values, dtype=np.float64).ravel()
+        if len(values) == 0:
+            return
+
+        ticks = np.clip((values / self.unit).astype(np.int64), 0, self.highest_ticks)
+        self.counts += np.bincount(self._indices(ticks), minlength=len(self.counts))
+
+        self.count += len(values)
+        self.sum += float(values.sum())
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+    def mean(self) -> float:
+        return self.sum / self.count
+
+    def percentile(self, q: float) -> float:
+        """Value below which <q> percent of the recorded values fall.
+
+        :param <q>: percentile, in [0, 100]
+        """
+
+        if self.count == 0:
+            raise ValueError('percentile of an empty histogram')
+
+        target = max(1, math.ceil(q / 100 * self.count))
+        index = int(np.searchsorted(np.cumsum(self.counts), target))
+        value = self._highest_equivalent(index) * self.unit
+
+        # Drop the floating point noise below the resolution (e.g. 0.8359000000000001)
+        value = round(value, -math.floor(math.log10(self.unit)))
+
+        return min(max(value, self.min), self.max)
+
+    def merge(self, other: 'WaitHistogram'):
+        """Add the values of another histogram with the same configuration.
+
+        :param <other>: WaitHistogram instance
+        """
+
+        if (self.unit, self.highest, self.digits) != (other.unit, other.highest, other.digits):
+            raise ValueError('cannot merge histograms with different configurations')
+
+        self.counts += other.counts
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def to_bytes(self) -> bytes:
+        """Serialize the histogram in a compact (compressed) payload."""
+
+        header = HEADER.pack(
+            self.unit, self.highest, self.digits,
+            self.count, self.sum, self.min, self.max)
+        return header + zlib.compress(self.counts.astype('<i8').tobytes())
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'WaitHistogram':
+        """Deserialize a histogram produced by <to_bytes>.
+
+        :param <data>: serialized histogram
+        """
+
+        unit, highest, digits, *stats = HEADER.unpack_from(data)
+        h = cls(unit, highest, digits)
+        h.counts = np.frombuffer(
+            zlib.decompress(data[HEADER.size:]), dtype='<i8').astype(np.int64)
+        h.count, h.sum, h.min, h.max = stats
+
+        return h
+
+    def _index(self, ticks: int) -> int:
+        bucket = (ticks | self.sub_bucket_mask).bit_length() - (self.half_magnitude + 1)
+        sub_bucket = ticks >> bucket
+        return ((bucket + 1) << self.half_magnitude) + sub_bucket - self.half_count
+
+    def _indices(self, ticks: np.ndarray) -> np.ndarray:
+        """Vectorised <_index>, the bit length comes from the exponent of (exact) floats."""
+
+        _, bit_length = np.frexp((ticks | self.sub_bucket_mask).astype(np.float64))
+        bucket = bit_length - (self.half_magnitude + 1)
+        sub_bucket = ticks >> bucket
+        return ((bucket + 1) << self.half_magnitude) + sub_bucket - self.half_count
+
+    def _highest_equivalent(self, index: int) -> int:
+        bucket = (index >> self.half_magnitude) - 1
+        sub_bucket = (index & (self.half_count - 1)) + self.half_count
+        if bucket < 0:
+            sub_bucket -= self.half_count
+            bucket = 0
+
+        return ((sub_bucket + 1) << bucket) - 1
+
+
+def merge_histograms(payloads) -> WaitHistogram:
+    """Merge serialized histograms (e.g. returned by several workers).
+
+    :param <payloads>: iterable of bytes produced by <WaitHistogram.to_bytes>
+    """
+
+    merged = None
+    for data in payloads:
+        h = WaitHistogram.from_bytes(data)
+        if merged is None:
+            merged = h
+        else:
+            merged.merge(h)
+
+    return merged
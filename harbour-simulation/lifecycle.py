@@ -0,0 +1,243 @@
+import numpy as np
+import simpy
+
+from histogram import WaitHistogram
+from recorder import SpillSeries
+
+# -------------------------
+# LIFECYCLE CONFIGURATION
+# -------------------------
+LIFECYCLE_INITIAL_ROWS = 4096 # preallocated records, doubled when full (or spilled)
+
+# Lifecycle events (columns of the timestamps table)
+ARRIVAL = 0
+DOCK_GRANTED = 1
+TUG_GRANTED = 2
+DOCKING_DONE = 3
+CARGO_DONE = 4
+BUNKERING_DONE = 5
+EXIT_TUG_GRANTED = 6
+EXIT = 7
+N_EVENTS = 8
+
+# Sojourn time decomposition: segment -> (from event, to event)
+SEGMENTS = {
+    'dock_wait': (ARRIVAL, DOCK_GRANTED),
+    'tug_wait': (DOCK_GRANTED, TUG_GRANTED),
+    'docking': (TUG_GRANTED, DOCKING_DONE),
+    'cargo': (DOCKING_DONE, CARGO_DONE),
+    'bunkering': (DOCKING_DONE, BUNKERING_DONE),
+    'exit_wait': (None, EXIT_TUG_GRANTED), # from the end of both cargo and bunkering
+    'undocking': (EXIT_TUG_GRANTED, EXIT),
+    'sojourn': (ARRIVAL, EXIT),
+}
+
+
+class ShipLifecycleTable:
+    """Columnar table holding one record of lifecycle timestamps per ship.
+
+    When spilling, a full table first moves its oldest records of exited ships to
+    compressed segments on disk, and only grows if that frees less than half of it:
+    memory then follows the ships in the system instead of the whole history.
+    """
+
+    # Environment
+    env: simpy.Environment
+
+    # Attributes
+    n_records: int
+    base: int # row of the first record held in memory
+    spill: SpillSeries # records moved to disk (None: not spilling)
+
+    def __init__(
+        self,
+        env: simpy.Environment,
+        rows: int = LIFECYCLE_INITIAL_ROWS,
+        spill_dir: str = None):
+        """Initializes the class.
+
+        :param <env>: simulation (simpy) environment
+        :param <rows>: number of preallocated records
+        :param <spill_dir>: directory where old records are spilled (None: kept in memory)
+        """
+
+        self.env = env
+        self.n_records = 0
+        self.base = 0
+
+        self.ids = np.empty(rows, dtype=np.int64)
+        self.priorities = np.empty(rows, dtype=np.int8)
+        self.times = np.full((rows, N_EVENTS), np.nan)
+
+        self.spill = None
+        if spill_dir is not None:
+            self.spill = SpillSeries('lifecycle', 2 + N_EVENTS, rows, spill_dir)
+
+    def __len__(self):
+        return self.n_records
+
+    def open(self, ship_id: int, priority: int, time: float = None) -> int:
+        """Add the record of an arrived ship.
+
+        :param <ship_id>: ship id
+        :param <priority>: ship priority
+        :param <time>: arrival time (None: now)
+        :return: row of the record, to be used with <stamp>
+        """
+
+        if self.n_records - self.base == len(self.ids):
+            self._make_room()
+
+        row = self.n_records
+        i = row - self.base
+        self.ids[i] = ship_id
+        self.priorities[i] = priority
+        self.times[i, ARRIVAL] = self.env.now if time is None else time
+        self.n_records += 1
+
+        return row
+
+    def stamp(self, row: int, event: int, time: float = None):
+        """Store the time of a lifecycle event of a ship.
+
+        :param <row>: row of the ship record
+        :param <event>: lifecycle event (column)
+        :param <time>: event time (None: now)
+        """
+
+        self.times[row - self.base, event] = self.env.now if time is None else time
+
+    def time(self, row: int, event: int) -> float:
+        """Time of a lifecycle event of a ship still in the system (NaN if not happened yet).
+
+        :param <row>: row of the ship record
+        :param <event>: lifecycle event (column)
+        """
+
+        return float(self.times[row - self.base, event])
+
+    def exited(self, row: int) -> bool:
+        """Whether a ship has left the system.
+
+        :param <row>: row of the ship record
+        """
+
+        return row < self.base or not np.isnan(self.times[row - self.base, EXIT])
+
+    def _make_room(self):
+        if self.spill is not None:
+            self._spill_exited()
+        if self.n_records - self.base > len(self.ids) // 2:
+            self._grow()
+
+    def _spill_exited(self):
+        """Move the oldest records, up to the first ship still in the system, to disk."""
+
+        n = self.n_records - self.base
+        in_system = np.isnan(self.times[:n, EXIT])
+        k = int(np.argmax(in_system)) if in_system.any() else n
+        if k == 0:
+            return
+
+        self.spill.extend(np.column_stack([self.ids[:k], self.priorities[:k], self.times[:k]]))
+
+        self.ids[:n - k] = self.ids[k:n]
+        self.priorities[:n - k] = self.priorities[k:n]
+        self.times[:n - k] = self.times[k:n]
+        self.times[n - k:] = np.nan
+        self.base += k
+
+    def _grow(self):
+        n = self.n_records - self.base
+        rows = 2 * len(self.ids)
+        self.ids = np.resize(self.ids, rows)
+        self.priorities = np.resize(self.priorities, rows)
+
+        times = np.full((rows, N_EVENTS), np.nan)
+        times[:n] = self.times[:n]
+        self.times = times
+
+    def iter_chunks(self):
+        """Yield all the records, spilled ones first, as (ids, priorities, times) arrays."""
+
+        if self.spill is not None:
+            for chunk in self.spill.iter_chunks():
+                yield chunk[:, 0].astype(np.int64), chunk[:, 1].astype(np.int8), chunk[:, 2:]
+
+        n = self.n_records - self.base
+        yield self.ids[:n], self.priorities[:n], self.times[:n]
+
+    def records(self) -> tuple:
+        """Whole table as (ids, priorities, times) arrays, loading spilled records."""
+
+        ids, priorities, times = zip(*self.iter_chunks())
+        return np.concatenate(ids), np.concatenate(priorities), np.concatenate(times)
+
+    def sojourn_breakdown(self, priority: int = None) -> dict:
+        """Compute the sojourn time segments of ships that exited the system.
+
+        :param <priority>: only ships of this priority (None: all)
+        :return: dict segment -> array of durations
+        """
+
+        _, priorities, times = self.records()
+        if priority is not None:
+            times = times[priorities == priority]
+
+        return _breakdown(times)
+
+    def report(self, percentiles=(50, 95, 99)) -> dict:
+        """Summarise the sojourn breakdown per priority class, streaming over the records.
+
+        Percentiles are exact, or come from a WaitHistogram per segment when spilling.
+
+        :param <percentiles>: percentiles to compute
+        :return: dict priority -> segment -> (n, avg, *percentiles)
+        """
+
+        durations = {} # (priority, segment) -> list of arrays, or histogram if spilling
+        for _, priorities, times in self.iter_chunks():
+            for priority in np.unique(priorities).tolist():
+                for segment, values in _breakdown(times[priorities == priority]).items():
+                    values = values[~np.isnan(values)]
+                    if self.spill is None:
+                        durations.setdefault((priority, segment), []).append(values)
+                        continue
+
+                    h = durations.setdefault((priority, segment), WaitHistogram())
+                    h.record_many(values)
+
+        report = {}
+        for priority in sorted({priority for priority, _ in durations}):
+            report[priority] = {}
+            for segment in SEGMENTS:
+                values = durations[priority, segment]
+                if self.spill is None:
+                    values = np.concatenate(values)
+                    if len(values) == 0:
+                        continue
+                    report[priority][segment] = (
+                        len(values),
+                        float(values.mean()),
+                        *np.percentile(values, percentiles).tolist())
+                elif len(values):
+                    report[priority][segment] = (
+                        len(values),
+                        values.mean(),
+                        *[values.percentile(q) for q in percentiles])
+
+        return report
+
+
+def _breakdown(times: np.ndarray) -> dict:
+    """Sojourn time segments of the exited ships among the given records."""
+
+    times = times[~np.isnan(times[:, EXIT])]
+
+    at_dock_end = np.maximum(times[:, CARGO_DONE], times[:, BUNKERING_DONE])
+    breakdown = {}
+    for segment, (start, end) in SEGMENTS.items():
+        start_times = at_dock_end if start is None else times[:, start]
+        breakdown[segment] = times[:, end] - start_times
+
+    return breakdown
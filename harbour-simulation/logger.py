@@ -10,6 +10,9 @@ LOG_LEVEL = logging.INFO
 ARRIVAL_LOG_FILE = 'harbour-simulation/data/logs/arrival.log'
 DOCK_LOG_FILE = 'harbour-simulation/data/logs/dock.log'
 QUEUES_LOG_FILE = 'harbour-simulation/data/logs/queues.log'
+DOE_LOG_FILE = 'harbour-simulation/data/logs/doe.log'
+RARE_EVENT_LOG_FILE = 'harbour-simulation/data/logs/rare_event.log'
+STRESS_LOG_FILE = 'harbour-simulation/data/logs/stress.log'
 
 # Arrivals Logger
 arrival_logger_file_handler = FileHandler(ARRIVAL_LOG_FILE, mode='w')
@@ -38,3 +41,30 @@ queues_logger_file_handler.setFormatter(Formatter(LOG_FORMAT))
 queues_logger = logging.getLogger('queues')
 queues_logger.setLevel(LOG_LEVEL)
 queues_logger.addHandler(queues_logger_file_handler)
+
+# Design of experiments Logger (file created only when used)
+doe_logger_file_handler = FileHandler(DOE_LOG_FILE, mode='w', delay=True)
+doe_logger_file_handler.setLevel(LOG_LEVEL)
+doe_logger_file_handler.setFormatter(Formatter(LOG_FORMAT))
+
+doe_logger = logging.getLogger('doe')
+doe_logger.setLevel(LOG_LEVEL)
+doe_logger.addHandler(doe_logger_file_handler)
+
+# Rare events Logger (file created only when used)
+rare_event_logger_file_handler = FileHandler(RARE_EVENT_LOG_FILE, mode='w', delay=True)
+rare_event_logger_file_handler.setLevel(LOG_LEVEL)
+rare_event_logger_file_handler.setFormatter(Formatter(LOG_FORMAT))
+
+rare_event_logger = logging.getLogger('rare_event')
+rare_event_logger.setLevel(LOG_LEVEL)
+rare_event_logger.addHandler(rare_event_logger_file_handler)
+
+# Stress test Logger (file created only when used)
+stress_logger_file_handler = FileHandler(STRESS_LOG_FILE, mode='w', delay=True)
+stress_logger_file_handler.setLevel(LOG_LEVEL)
+stress_logger_file_handler.setFormatter(Formatter(LOG_FORMAT))
+
+stress_logger = logging.getLogger('stress')
+stress_logger.setLevel(LOG_LEVEL)
+stress_logger.addHandler(stress_logger_file_handler)
@@ -2,8 +2,13 @@ import itertools
 import random
 import simpy
 
+from arrival_trace import read_trace
+from lifecycle import (BUNKERING_DONE, CARGO_DONE, DOCK_GRANTED, DOCKING_DONE,
+                       EXIT, EXIT_TUG_GRANTED, TUG_GRANTED)
 from logger import arrival_logger, dock_logger
+from objects.dock_allocator import ScalableDockResource
 from objects.fuel_barge import FuelBarge
+from objects.maintenance_scheduler import MaintenanceScheduler
 from objects.priority_filter_store import MyPriorityFilterStore
 from objects.ship import Ship, SpecialShip
 from objects.tug import Tug
@@ -27,23 +32,58 @@ CARGO_TIME_STD = 0.50
 
 SIM_TIME = 120 # (hours in real world)
 
+# Docks allocator: 'priority' (simpy.PriorityResource) or 'scalable' (large harbours)
+DOCK_ALLOCATOR = 'priority'
+
+# Replay arrivals from a schedule (.csv, .npy or .bin), None: synthetic arrivals
+ARRIVAL_TRACE = None
+
+# Record series with a fixed memory budget, spilling to disk (long horizons)
+SPILL_TO_DISK = False
+
+
+def build_harbour(env: simpy.Environment, monitor: SystemMonitor, maintenance: bool = True):
+    """Creates harbour resources and starts their initialization.
+    
+    :param <env>: simulation (simpy) environment
+    :param <monitor>: SystemMonitor class instance
+    :param <maintenance>: if false, tugs get no periodic maintenance
+    :return: tuple (docks, tugs, fuel_barges) of resources
+    """
+
+    tugs = MyPriorityFilterStore(env, capacity=N_TUGS)
+    if DOCK_ALLOCATOR == 'scalable':
+        docks = ScalableDockResource(env, capacity=N_DOCKS)
+    else:
+        docks = simpy.PriorityResource(env, capacity=N_DOCKS)
+    fuel_barges = simpy.Store(env, capacity=N_FUEL_BARGES)
+
+    # Tugs are all maintained by a single scheduler
+    scheduler = MaintenanceScheduler(env, tugs, monitor)
+    env.process(init_harbour(env, tugs, fuel_barges, scheduler, maintenance))
+
+    return docks, tugs, fuel_barges
+
 
 def init_harbour(
     env, 
     tugs: MyPriorityFilterStore, 
     fuel_barges: simpy.Store, 
-    monitor: SystemMonitor):
+    scheduler: MaintenanceScheduler,
+    maintenance: bool = True):
     """Initializes <simpy.Store> resources, inserting related objects.
     
     :param <env>: simulation (simpy) environment
     :param <tugs>: MyPriorityFilterStore resource instance
     :param <fuel_barges>: simpy Store resource instance
-    :param <monitor>: SystemMonitor class instance
+    :param <scheduler>: MaintenanceScheduler class instance
+    :param <maintenance>: if false, tugs get no periodic maintenance
     """
 
     # Spawn tugs
     for id in range(N_TUGS):
-        t = Tug(env, id, tugs, monitor)
+        t = Tug(env, id)
+        scheduler.register(t, schedule=maintenance)
         yield tugs.put(t)
 
     # Spawn fuel barges
@@ -74,15 +114,66 @@ def ship_arrival(
         # 20% of ships will be of higher priority (special ships)
         if random.randint(1, 10) > 2:
             s = Ship(i)
-            arrival_logger.info(f'[{env.now:.3f}]: Ship {s.id} arrived!')
         else:
             s = SpecialShip(i)
-            arrival_logger.info(f'[{env.now:.3f}]: Special ship {s.id} arrived!')
-        
-        am.new_ship(s.priority)
 
-        # Start ship docking process
-        env.process(ship_docking(env, s, docks, tugs, fuel_barges))
+        ship_arrived(env, s, docks, tugs, fuel_barges)
+
+
+def trace_arrival(
+    env: simpy.Environment, 
+    docks: simpy.PriorityResource, 
+    tugs: MyPriorityFilterStore, 
+    fuel_barges: simpy.Store,
+    path: str):
+    """Simulates ship arrivals replaying a historical schedule, streamed from file.
+    
+    :param <env>: simulation (simpy) environment
+    :param <docks>: simpy PriorityResource instance
+    :param <tugs>: MyPriorityFilterStore resource instance
+    :param <fuel_barges>: simpy Store resource instance
+    :param <path>: path of the schedule (see arrival_trace.read_trace)
+    """
+
+    for i, (arrival_time, priority, fuel_capacity, fuel_level) in enumerate(read_trace(path)):
+        if arrival_time > env.now:
+            yield env.timeout(arrival_time - env.now)
+
+        s : Ship
+
+        if priority == 0:
+            s = Ship(i, fuel_capacity, fuel_level)
+        else:
+            s = SpecialShip(i, fuel_capacity, fuel_level)
+
+        ship_arrived(env, s, docks, tugs, fuel_barges)
+
+
+def ship_arrived(
+    env: simpy.Environment, 
+    s: Ship,
+    docks: simpy.PriorityResource, 
+    tugs: MyPriorityFilterStore, 
+    fuel_barges: simpy.Store):
+    """Registers the arrival of a ship and starts its docking.
+    
+    :param <env>: simulation (simpy) environment
+    :param <s>: Ship class instance
+    :param <docks>: simpy PriorityResource instance
+    :param <tugs>: MyPriorityFilterStore resource instance
+    :param <fuel_barges>: simpy Store resource instance
+    """
+
+    if s.priority == 0:
+        arrival_logger.info(f'[{env.now:.3f}]: Ship {s.id} arrived!')
+    else:
+        arrival_logger.info(f'[{env.now:.3f}]: Special ship {s.id} arrived!')
+
+    am.new_ship(s.priority)
+    s.record = am.lifecycle.open(s.id, s.priority)
+
+    # Start ship docking process
+    env.process(ship_docking(env, s, docks, tugs, fuel_barges))
 
 
 def ship_docking(
@@ -104,11 +195,13 @@ def ship_docking(
     start = env.now
     dock = docks.request(priority=s.priority, preempt=False)
     yield dock
+    am.lifecycle.stamp(s.record, DOCK_GRANTED)
     arrival_logger.info(f'[{env.now:.3f}]: Ship {s.id} obtained dock.')
 
     # Request a tug
     tug = yield tugs.get(priority=s.priority)
-    am.add_to_entrance_queue(env.now - start)
+    am.add_to_entrance_queue(env.now - start, s.priority)
+    am.lifecycle.stamp(s.record, TUG_GRANTED)
     arrival_logger.info(f'[{env.now:.3f}]: Ship {s.id} obtained tug {tug.id}.')
 
     # Simulate docking
@@ -118,11 +211,12 @@ def ship_docking(
 
     # Docking completed
     am.docking_completed()
+    am.lifecycle.stamp(s.record, DOCKING_DONE)
     arrival_logger.info(f'[{env.now:.3f}]: Ship {s.id} completed docking.')
     yield tugs.put(tug)
 
     # Start ship at dock process
-    env.process(ship_at_dock(env, s, docks, dock, fuel_barges))
+    env.process(ship_at_dock(env, s, docks, dock, tugs, fuel_barges))
 
 
 def ship_at_dock(
@@ -130,6 +224,7 @@ def ship_at_dock(
     s: Ship,
     docks: simpy.PriorityResource,
     dock,
+    tugs: MyPriorityFilterStore,
     fuel_barges: simpy.Store):
     """Simulates docking of a ship performed by a tug with a gaussian distribution.
     
@@ -137,6 +232,7 @@ def ship_at_dock(
     :param <s>: Ship class instance
     :param <docks>: simpy PriorityResource instance
     :param <dock>: resource obtained by a get request on a PriorityResource
+    :param <tugs>: MyPriorityFilterStore resource instance
     :param <fuel_barges>: simpy Store resource instance
     """
 
@@ -145,11 +241,29 @@ def ship_at_dock(
         ship_cargo(env, s)) & env.process(ship_bunkering(env, s, fuel_barges))
 
     # Start exiting harbour
+    yield from ship_leaving(env, s, docks, dock, tugs)
+
+
+def ship_leaving(
+    env: simpy.Environment, 
+    s: Ship,
+    docks: simpy.PriorityResource,
+    dock,
+    tugs: MyPriorityFilterStore):
+    """Simulates un-docking of a ship performed by a tug, and its exit from the harbour.
+    
+    :param <env>: simulation (simpy) environment
+    :param <s>: Ship class instance
+    :param <docks>: simpy PriorityResource instance
+    :param <dock>: resource obtained by a get request on a PriorityResource
+    :param <tugs>: MyPriorityFilterStore resource instance
+    """
 
     # Request a tug
     start = env.now
     tug = yield tugs.get(priority=s.priority-1)
-    am.add_to_exit_queue(env.now - start)
+    am.add_to_exit_queue(env.now - start, s.priority)
+    am.lifecycle.stamp(s.record, EXIT_TUG_GRANTED)
     am.tug_locked()
 
     am.ship_supplied()
@@ -162,6 +276,7 @@ def ship_at_dock(
     yield tugs.put(tug)
     am.tug_released()
     am.ship_exited()
+    am.lifecycle.stamp(s.record, EXIT)
     arrival_logger.info(f'[{env.now:.3f}]: Ship {s.id} exited.')
 
 
@@ -175,6 +290,7 @@ def ship_cargo(env: simpy.Environment, s: Ship):
     # Simulate loading/unloading
     dock_logger.info(f'[{env.now:.3f}]: Ship {s.id} starts unloading.')
     yield env.timeout(abs(random.gauss(CARGO_TIME_MEAN, CARGO_TIME_STD)))
+    am.lifecycle.stamp(s.record, CARGO_DONE)
     dock_logger.info(f'[{env.now:.3f}]: Ship {s.id} completed unloading.')
 
 
@@ -188,10 +304,17 @@ def ship_bunkering(env: simpy.Environment, s: Ship, fuel_barges: simpy.Store):
 
     supplied: bool = False
 
+    # Tank already full -> no barge needed
+    if s.fuel_level >= s.fuel_capacity:
+        am.bunkering_skipped()
+        am.lifecycle.stamp(s.record, BUNKERING_DONE)
+        dock_logger.info(f'[{env.now:.3f}]: Ship {s.id} needs no bunkering.')
+        return
+
     # Request a barge
     start = env.now
     barge = yield fuel_barges.get()
-    am.add_to_bunkering_queue(env.now - start)
+    am.add_to_bunkering_queue(env.now - start, s.priority)
 
     # Start bunkering
     am.start_bunkering()
@@ -220,33 +343,62 @@ def ship_bunkering(env: simpy.Environment, s: Ship, fuel_barges: simpy.Store):
 
         # Barge level not full and not enough -> take all and barge refuel
         else:
-            s.fuel_level += barge.fuel_tank.level
-            yield barge.fuel_tank.get(barge.fuel_tank.level)
+            if barge.fuel_tank.level > 0:
+                s.fuel_level += barge.fuel_tank.level
+                yield barge.fuel_tank.get(barge.fuel_tank.level)
             yield env.process(barge.barge_refuel())
 
     # Bunkering completed
+    am.lifecycle.stamp(s.record, BUNKERING_DONE)
     dock_logger.info(f'[{env.now:.3f}]: Ship {s.id} supplied.')
     yield fuel_barges.put(barge)
     am.bunkering_completed()
 
 
-if __name__ == '__main__':
+def run_simulation(sim_time: float = SIM_TIME, seed=None) -> SystemMonitor:
+    """Builds the harbour and runs a whole simulation.
+
+    :param <sim_time>: simulation horizon (hours)
+    :param <seed>: seed of the random generator (None: not seeded)
+    :return: SystemMonitor instance holding the results
+    """
+
+    global am
+
+    if seed is not None:
+        random.seed(seed)
 
     am = SystemMonitor()
     env = simpy.Environment()
-    am.init(env, N_DOCKS, N_TUGS, N_FUEL_BARGES)
+    am.init(env, N_DOCKS, N_TUGS, N_FUEL_BARGES, spill=SPILL_TO_DISK)
 
     # Resources
-    tugs = MyPriorityFilterStore(env, capacity=N_TUGS)
-    docks = simpy.PriorityResource(env, capacity=N_DOCKS)
-    fuel_barges = simpy.Store(env, capacity=N_FUEL_BARGES)
+    docks, tugs, fuel_barges = build_harbour(env, am)
 
     # Simulation
-    env.process(init_harbour(env, tugs, fuel_barges, am))
-    env.process(ship_arrival(env, docks, tugs, fuel_barges))
-    env.run(until=SIM_TIME)
+    if ARRIVAL_TRACE is None:
+        env.process(ship_arrival(env, docks, tugs, fuel_barges))
+    else:
+        env.process(trace_arrival(env, docks, tugs, fuel_barges, ARRIVAL_TRACE))
+    try:
+        env.run(until=sim_time)
+    except BaseException:
+        # Interrupted runs leave no spilled segments behind
+        am.close()
+        raise
+
+    return am
+
+
+if __name__ == '__main__':
+
+    am = run_simulation()
 
     # Plot results
-    am.plot_arrivals()
-    am.plot_dockings()
-    am.store_queues_times()
+    try:
+        am.plot_arrivals()
+        am.plot_dockings()
+        am.store_queues_times()
+        am.store_lifecycle_report()
+    finally:
+        am.close()
@@ -0,0 +1,147 @@
+import heapq
+from collections import deque
+
+import simpy
+
+
+class DockRequest(simpy.events.Event):
+    """Request of a dock, triggered when the dock is granted."""
+
+    def __init__(self, resource, priority: int = 0, preempt: bool = False):
+        """Initializes the class.
+
+        :param <resource>: ScalableDockResource instance
+        :param <priority>: priority of the request (smaller -> more important)
+        :param <preempt>: not supported, must be False
+        """
+
+        if preempt:
+            raise ValueError('ScalableDockResource does not support preemption')
+
+        super().__init__(resource.env)
+
+        self.resource = resource
+        self.priority = priority
+
+        # The time at which the request was made
+        self.time = self.env.now
+
+        # The time at which the request succeeded
+        self.usage_since = None
+
+        self.cancelled = False
+
+        resource._request(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.triggered:
+            self.resource.release(self)
+        else:
+            self.cancel()
+
+    def cancel(self):
+        """Withdraw the request if it has not been granted yet."""
+
+        if not self.triggered and not self.cancelled:
+            self.cancelled = True
+            self.resource.n_queued -= 1
+
+
+class ScalableDockResource:
+    """Docks allocator for large harbours, alternative to <simpy.PriorityResource>.
+
+    Waiting requests are kept in a FIFO queue per priority class, the classes in a
+    heap: request, release and grant cost O(log(n. of classes)), whatever the number
+    of docks and of waiting ships. Only non-preemptive requests are supported.
+    """
+
+    # Environment
+    env: simpy.Environment
+
+    def __init__(self, env: simpy.Environment, capacity: int):
+        """Initializes the class.
+
+        :param <env>: simulation (simpy) environment
+        :param <capacity>: number of docks
+        """
+
+        self.env = env
+        self._capacity = capacity
+
+        self.users = set()
+        self.queues = {} # priority -> deque of requests
+        self.classes = [] # heap of priorities with a non-empty queue
+        self.n_queued = 0
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    @property
+    def count(self) -> int:
+        return len(self.users)
+
+    def request(self, priority: int = 0, preempt: bool = False) -> DockRequest:
+        """Request a dock, same interface of <simpy.PriorityResource.request>.
+
+        :param <priority>: priority of the request (smaller -> more important)
+        :param <preempt>: not supported, must be False
+        """
+
+        return DockRequest(self, priority, preempt)
+
+    def release(self, request: DockRequest) -> simpy.events.Event:
+        """Release a dock, granting it to the first waiting request.
+
+        :param <request>: granted DockRequest
+        """
+
+        if request in self.users:
+            self.users.remove(request)
+
+            next_request = self._pop()
+            if next_request is not None:
+                self._grant(next_request)
+
+        event = self.env.event()
+        event.succeed()
+        return event
+
+    def _request(self, request: DockRequest):
+        if len(self.users) < self._capacity and self.n_queued == 0:
+            self._grant(request)
+            return
+
+        queue = self.queues.get(request.priority)
+        if queue is None:
+            queue = self.queues[request.priority] = deque()
+        if not queue:
+            heapq.heappush(self.classes, request.priority)
+
+        queue.append(request)
+        self.n_queued += 1
+
+    def _pop(self):
+        """Remove and return the first waiting request (None if there is none)."""
+
+        while self.classes:
+            queue = self.queues[self.classes[0]]
+            while queue:
+                request = queue.popleft()
+                if not request.cancelled:
+                    if not queue:
+                        heapq.heappop(self.classes)
+                    self.n_queued -= 1
+                    return request
+
+            heapq.heappop(self.classes)
+
+        return None
+
+    def _grant(self, request: DockRequest):
+        self.users.add(request)
+        request.usage_since = self.env.now
+        request.succeed()
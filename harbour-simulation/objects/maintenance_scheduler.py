@@ -0,0 +1,184 @@
+import heapq
+import itertools
+import random
+import simpy
+
+import objects.tug
+from logger import arrival_logger
+from objects.tug import Tug
+
+# Calendar entries kinds
+DUE = 0
+COMPLETED = 1
+
+
+class MaintenanceScheduler:
+    """Single scheduler of the whole fleet maintenance.
+
+    It keeps a calendar (heap) of next-due times and maintenance completions, served
+    by one alarm event at a time. A tug due while busy is taken out as soon as it is
+    put back in the pool, before any waiting ship can get it.
+    """
+
+    # Environment
+    env: simpy.Environment
+
+    def __init__(self, env: simpy.Environment, tugs, monitor):
+        """Initializes the class.
+
+        :param <env>: simulation (simpy) environment
+        :param <tugs>: MyPriorityFilterStore class instance
+        :param <monitor>: SystemMonitor instance
+        """
+
+        self.env = env
+        self.tugs = tugs
+        self.monitor = monitor
+
+        self.calendar = [] # (time, seq, kind, tug)
+        self.seq = itertools.count()
+        self.alarm = None
+        self.alarm_at = None
+
+        self.fleet = {} # id -> tug
+        self.scheduled = set() # ids of tugs with periodic maintenance
+        self.next_due = {} # id -> calendar seq of the pending due entry
+        self.overdue = {} # id -> external, for tugs due while busy
+        self.in_maintenance = {} # id -> calendar seq of the completion (None: external)
+
+        # Intercept tugs put back in the pool
+        tugs.scheduler = self
+
+    def register(self, tug: Tug, schedule: bool = True):
+        """Add a tug to the fleet and schedule its first maintenance.
+
+        :param <tug>: Tug class instance
+        :param <schedule>: if false, the tug is only maintained via <take_out>
+        """
+
+        self.fleet[tug.id] = tug
+        if schedule:
+            self.scheduled.add(tug.id)
+            self._schedule_next(tug)
+
+    def take_out(self, tug_id: int):
+        """Start an external (unscheduled) maintenance, ended by <bring_back>.
+
+        :param <tug_id>: id of the tug
+        """
+
+        tug = self.fleet[tug_id]
+        if tug.id in self.in_maintenance or tug.id in self.overdue:
+            return
+
+        # Planned maintenance is superseded
+        self.next_due.pop(tug.id, None)
+        self._due(tug, external=True)
+
+    def bring_back(self, tug_id: int):
+        """End the maintenance of a tug now, scheduled or external.
+
+        :param <tug_id>: id of the tug
+        """
+
+        tug = self.fleet[tug_id]
+        if self.overdue.pop(tug.id, None) is not None and tug.id in self.scheduled:
+            self._schedule_next(tug)
+        if tug.id in self.in_maintenance:
+            self._complete(tug)
+
+    def claim(self, tug: Tug) -> bool:
+        """Called by the pool when a tug is put back, take it if maintenance is overdue.
+
+        :param <tug>: Tug class instance
+        :return: True if the tug goes in maintenance instead of the pool
+        """
+
+        if tug.id not in self.overdue:
+            return False
+
+        self._start(tug, self.overdue.pop(tug.id))
+        return True
+
+    def _schedule_next(self, tug: Tug):
+        self.next_due[tug.id] = self._push(
+            self.env.now + abs(random.gauss(
+                objects.tug.TUG_MAINTENANCE_FREQUENCY,
+                objects.tug.TUG_MAINTENANCE_FREQUENCY_MEAN)),
+            DUE,
+            tug)
+
+    def _push(self, time: float, kind: int, tug: Tug) -> int:
+        seq = next(self.seq)
+        heapq.heappush(self.calendar, (time, seq, kind, tug))
+
+        # Move the alarm earlier if needed
+        if self.alarm_at is None or time < self.alarm_at:
+            self._set_alarm(time)
+
+        return seq
+
+    def _set_alarm(self, time: float):
+        self.alarm_at = time
+        self.alarm = self.env.timeout(time - self.env.now)
+        self.alarm.callbacks.append(self._ring)
+
+    def _ring(self, event):
+        """Serve all calendar entries due now, then set the next alarm."""
+
+        # Superseded by an earlier alarm
+        if event is not self.alarm:
+            return
+
+        self.alarm = self.alarm_at = None
+        while self.calendar and self.calendar[0][0] <= self.env.now:
+            _, seq, kind, tug = heapq.heappop(self.calendar)
+
+            # Entries superseded by an external maintenance are skipped
+            if kind == DUE and self.next_due.get(tug.id) == seq:
+                del self.next_due[tug.id]
+                self._due(tug)
+            elif kind == COMPLETED and self.in_maintenance.get(tug.id, -1) == seq:
+                self._complete(tug)
+
+        next_time = self.calendar[0][0] if self.calendar else None
+        if next_time is not None and (self.alarm_at is None or next_time < self.alarm_at):
+            self._set_alarm(next_time)
+
+    def _due(self, tug: Tug, external: bool = False):
+        """Take out an idle tug, or mark a busy one for maintenance at its release."""
+
+        if not self.tugs.take(tug):
+            self.overdue[tug.id] = external
+            arrival_logger.info(f'[{self.env.now:.3f}]: Tug {tug.id} scheduled for maintenance!')
+            return
+
+        self._start(tug, external)
+
+    def _start(self, tug: Tug, external: bool = False):
+        tug.set_working(False)
+        tug.set_maintenance(True)
+        self.in_maintenance[tug.id] = None
+
+        self.monitor.start_maintenance()
+        arrival_logger.info(f'[{self.env.now:.3f}]: Tug {tug.id} in maintenance!')
+
+        # Simulate maintenance duration, external ones last until <bring_back>
+        if not external:
+            self.in_maintenance[tug.id] = self._push(
+                self.env.now + random.expovariate(objects.tug.TUG_MAINTENANCE_LAMBDA),
+                COMPLETED,
+                tug)
+
+    def _complete(self, tug: Tug):
+        # Make tug available again
+        del self.in_maintenance[tug.id]
+        self.tugs.put(tug)
+
+        self.monitor.maintenance_completed()
+        tug.set_maintenance(False)
+        arrival_logger.info(f'[{self.env.now:.3f}]: Tug {tug.id} finished maintenance!')
+
+        # Tugs with periodic maintenance get the next one
+        if tug.id in self.scheduled:
+            self._schedule_next(tug)
@@ -31,7 +31,55 @@ class MyPriorityFilterStoreGet(simpy.resources.base.Get):
         super().__init__(resource)
 
 class MyPriorityFilterStore(simpy.resources.store.FilterStore):
-    """Extension of SimPy FilterStore, overwriting get request."""
+    """Extension of SimPy FilterStore, overwriting get request.
+
+    Items are kept in an insertion-ordered dict (same FIFO order of the list used by
+    FilterStore), so that a given item is taken out in constant time.
+    """
     
     GetQueue = simpy.resources.resource.SortedQueue
-    get = BoundClass(MyPriorityFilterStoreGet)
\ No newline at end of file
+    get = BoundClass(MyPriorityFilterStoreGet)
+
+    # Optional MaintenanceScheduler, may claim items being put back
+    scheduler = None
+
+    def __init__(self, env: simpy.Environment, capacity=float('inf')):
+        """Initializes the class.
+
+        :param <env>: simulation (simpy) environment
+        :param <capacity>: maximum number of items
+        """
+
+        super().__init__(env, capacity)
+        self.items = {} # item -> None, in insertion order
+
+    def take(self, item) -> bool:
+        """Remove an available item from the store, bypassing get requests.
+
+        :param <item>: item to remove
+        :return: False if the item is not in the store
+        """
+
+        if item not in self.items:
+            return False
+
+        del self.items[item]
+        return True
+
+    def _do_put(self, event):
+        if self.scheduler is not None and self.scheduler.claim(event.item):
+            event.succeed()
+            return None
+
+        if len(self.items) < self._capacity:
+            self.items[event.item] = None
+            event.succeed()
+        return None
+
+    def _do_get(self, event):
+        for item in self.items:
+            if event.filter(item):
+                del self.items[item]
+                event.succeed(item)
+                break
+        return True
@@ -6,6 +6,11 @@ import random
 FUEL_CAPACITY_MEAN = 15
 FUEL_CAPACITY_STD = 5 
 
+# Fuel capacity drawn uniformly in [MIN, MAX] units of FUEL_CAPACITY_UNIT liters
+FUEL_CAPACITY_MIN = 5
+FUEL_CAPACITY_MAX = 15
+FUEL_CAPACITY_UNIT = 10_000
+
 
 class Ship(object):
     """Class representing a default ship object."""
@@ -15,27 +20,38 @@ class Ship(object):
     fuel_capacity: int # maximum fuel capacity
     fuel_level: int # current fuel level
     priority: int = 0 # ship priority
+    record: int # row of the ship lifecycle record
     
-    def __init__(self, id: int):
+    def __init__(self, id: int, fuel_capacity: int = None, fuel_level: int = None):
         """Initializes the class.
         
         :param <id>: ship id
+        :param <fuel_capacity>: maximum fuel capacity (None: random)
+        :param <fuel_level>: current fuel level (None: random)
         """
 
         self.id = id
 
-        # Generate random fuel capacity and level
-        self.fuel_capacity = random.randint(5, 15) * 10_000
-        self.fuel_level = int(
-            random.uniform(self.fuel_capacity*0.4, self.fuel_capacity*0.8))
+        # Generate random fuel capacity and level, if not given
+        if fuel_capacity is None:
+            fuel_capacity = random.randint(
+                FUEL_CAPACITY_MIN, FUEL_CAPACITY_MAX) * FUEL_CAPACITY_UNIT
+        if fuel_level is None:
+            fuel_level = int(
+                random.uniform(fuel_capacity*0.4, fuel_capacity*0.8))
+
+        self.fuel_capacity = fuel_capacity
+        self.fuel_level = fuel_level
 
 class SpecialShip(Ship):
     """Class representing a (special) higher priority ship object."""
     
-    def __init__(self, id: int):
+    def __init__(self, id: int, fuel_capacity: int = None, fuel_level: int = None):
         """Initializes the class.
         
         :param <id>: special ship id
+        :param <fuel_capacity>: maximum fuel capacity (None: random)
+        :param <fuel_level>: current fuel level (None: random)
         """
-        super().__init__(id)
+        super().__init__(id, fuel_capacity, fuel_level)
         self.priority = -1
@@ -0,0 +1,494 @@
+import logging
+import math
+import multiprocessing
+import os
+import pickle
+import random
+import traceback
+from statistics import NormalDist
+
+import numpy as np
+import simpy
+
+import main
+from lifecycle import ARRIVAL, TUG_GRANTED
+from logger import rare_event_logger
+from system_monitor import SystemMonitor
+
+# -------------------------
+# RARE EVENT CONFIGURATION
+# -------------------------
+RARE_HORIZON = main.SIM_TIME # (hours)
+RARE_SEED = 42
+RARE_WORKERS = multiprocessing.cpu_count()
+RARE_CONFIDENCE = 0.95 # (Student-t confidence intervals)
+RARE_MIN_HITS = 10 # fewer hits make the confidence interval unreliable
+
+# Importance sampling: P(max entrance wait >= threshold within the horizon)
+# (over SIM_TIME the max. entrance wait is ~54 hours on average, std ~5)
+IS_WAIT_THRESHOLD = 70 # (hours)
+IS_RUNS = 1000
+IS_CE_RUNS = 200 # runs of each cross-entropy iteration choosing the tilted rate
+IS_CE_ITERATIONS = 10
+IS_CE_ELITE = 0.1 # fraction of best runs raising the intermediate threshold
+IS_DEFENSIVE = 0.1 # fraction of runs at the nominal rate, bounding the weights to 1/IS_DEFENSIVE
+
+# Multilevel splitting: P(ships waiting reaches the target within the horizon)
+# (over SIM_TIME at most ~216 ships wait at once on average, std ~26)
+SPLITTING_TARGET = 300
+SPLITTING_DRIFT = 1.8 # (ships/hour) average growth of the ships waiting, see <splitting_score>
+SPLITTING_RATIO = 0.3 # hit ratio aimed at by each stage (levels chosen by a pilot)
+SPLITTING_PILOT_RUNS = 50 # trajectories of the pilot choosing the levels
+SPLITTING_MAX_LEVELS = 20
+SPLITTING_RUNS = 100 # trajectories started from scratch by each repetition
+SPLITTING_REPETITIONS = 10 # independent estimates, for the confidence interval
+
+
+def start_harbour(seed: int):
+    """Builds the harbour with synthetic arrivals, without running it.
+
+    :param <seed>: seed of the random generator
+    :return: tuple (env, monitor)
+    """
+
+    random.seed(seed)
+
+    am = SystemMonitor()
+    env = simpy.Environment()
+    am.init(env, main.N_DOCKS, main.N_TUGS, main.N_FUEL_BARGES)
+    main.am = am
+
+    docks, tugs, fuel_barges = main.build_harbour(env, am)
+    env.process(main.ship_arrival(env, docks, tugs, fuel_barges))
+
+    return env, am
+
+
+def max_entrance_wait(am: SystemMonitor, horizon: float) -> float:
+    """Longest entrance wait within the horizon, counting ships still waiting at its end.
+
+    :param <am>: SystemMonitor instance
+    :param <horizon>: simulation horizon (hours)
+    """
+
+    _, _, times = am.lifecycle.records()
+    if len(times) == 0:
+        return 0.0
+
+    granted = np.where(np.isnan(times[:, TUG_GRANTED]), horizon, times[:, TUG_GRANTED])
+    return float(np.max(granted - times[:, ARRIVAL]))
+
+
+# -------------------------
+# IMPORTANCE SAMPLING
+# -------------------------
+
+def is_window(threshold: float) -> float:
+    """End of the tilted part of the horizon: a ship waiting <threshold> arrived before it.
+
+    :param <threshold>: entrance wait threshold (hours)
+    """
+
+    return max(RARE_HORIZON - threshold, 0.0)
+
+
+def restore_arrival_rate(env: simpy.Environment, rate: float, at: float):
+    """Sets the ships arrival rate back to <rate> at time <at>."""
+
+    yield env.timeout(at)
+    main.SHIP_ARRIVAL_LAMBDA = rate
+
+
+def is_replication(task) -> tuple:
+    """Runs one replication with arrivals at <rate> up to <window> (worker side).
+
+    A ship waiting the threshold arrived within the window, so later arrivals keep the
+    nominal rate. The changed part ends at the first arrival after the window (drawn
+    at <rate>), its arrivals give the likelihood ratio (see <log_likelihood_ratio>).
+
+    :param <task>: tuple (lambda within the window, window, seed)
+    :return: tuple (max. entrance wait, n. of arrivals up to the exposure, exposure)
+    """
+
+    rate, window, seed = task
+    base = main.SHIP_ARRIVAL_LAMBDA
+
+    main.SHIP_ARRIVAL_LAMBDA = rate
+    try:
+        env, am = start_harbour(seed)
+        env.process(restore_arrival_rate(env, base, window))
+        env.run(until=RARE_HORIZON)
+    finally:
+        main.SHIP_ARRIVAL_LAMBDA = base
+
+    _, _, times = am.lifecycle.records()
+    arrivals = times[:, ARRIVAL]
+    after = arrivals[arrivals > window]
+    exposure = float(after[0]) if len(after) else RARE_HORIZON
+    n = int(np.sum(arrivals <= exposure))
+
+    return max_entrance_wait(am, RARE_HORIZON), n, exposure
+
+
+def log_likelihood_ratio(n: np.ndarray, exposure: np.ndarray, tilted: float) -> np.ndarray:
+    """Log of nominal / tilted likelihood of Poisson arrivals, <n> of them on [0, exposure].
+
+    :param <n>: number of arrivals up to the exposure
+    :param <exposure>: end of the tilted part
+    :param <tilted>: tilted arrival rate
+    """
+
+    base = main.SHIP_ARRIVAL_LAMBDA
+    return n * math.log(base / tilted) + (tilted - base) * exposure
+
+
+def cross_entropy_tilt(pool, threshold: float = IS_WAIT_THRESHOLD) -> tuple:
+    """Chooses the tilted arrival rate with the (multilevel) cross-entropy method.
+
+    For a Poisson process tilted on [0, exposure] the update is
+    lambda = sum(I*L*N) / sum(I*L*exposure). The intermediate level never decreases,
+    as long as some run still reaches it.
+
+    :param <pool>: worker pool
+    :param <threshold>: entrance wait threshold (hours)
+    :return: tuple (tilted lambda, True if the level reached the threshold)
+    """
+
+    tilted = main.SHIP_ARRIVAL_LAMBDA
+    window = is_window(threshold)
+    level = 0.0
+    for i in range(IS_CE_ITERATIONS):
+        seeds = range(RARE_SEED + i * IS_CE_RUNS, RARE_SEED + (i + 1) * IS_CE_RUNS)
+        results = np.array(pool.map(is_replication, [(tilted, window, s) for s in seeds]))
+        waits, n, exposure = results.T
+        log_lr = log_likelihood_ratio(n, exposure, tilted)
+
+        quantile = np.quantile(waits, 1 - IS_CE_ELITE)
+        if np.any(waits >= level):
+            quantile = max(quantile, level)
+        level = min(threshold, quantile)
+
+        weights = (waits >= level) * np.exp(log_lr)
+        tilted = float(np.sum(weights * n) / np.sum(weights * exposure))
+
+        rare_event_logger.info(
+            f'[IS_CROSS_ENTROPY]: Iteration: {i}, Level: {level}, Lambda: {tilted}')
+        if level >= threshold:
+            return tilted, True
+
+    rare_event_logger.warning(
+        f'[IS_CROSS_ENTROPY]: Level {level} did not reach the threshold {threshold} '
+        f'in {IS_CE_ITERATIONS} iterations, the estimate may be unreliable')
+    return tilted, False
+
+
+def mixture_weights(
+    n: np.ndarray, exposure: np.ndarray, tilted: float, defensive: float) -> np.ndarray:
+    """Likelihood ratios nominal / mixture, for runs drawn at the nominal rate with
+    probability <defensive> and at the tilted one otherwise (at most 1 / defensive).
+
+    :param <n>: number of arrivals up to the exposure
+    :param <exposure>: end of the tilted part
+    :param <tilted>: tilted arrival rate
+    :param <defensive>: fraction of runs at the nominal rate
+    """
+
+    return 1 / (defensive + (1 - defensive) * np.exp(-log_likelihood_ratio(n, exposure, tilted)))
+
+
+def student_t_quantile(p: float, dof: int) -> float:
+    """Quantile of the Student-t distribution (Cornish-Fisher expansion, exact for 1-2 dof).
+
+    :param <p>: probability, in (0, 1)
+    :param <dof>: degrees of freedom
+    """
+
+    if dof == 1:
+        return math.tan(math.pi * (p - 0.5))
+    if dof == 2:
+        return (2 * p - 1) / math.sqrt(2 * p * (1 - p))
+
+    z = NormalDist().inv_cdf(p)
+    terms = [
+        (z**3 + z) / 4,
+        (5 * z**5 + 16 * z**3 + 3 * z) / 96,
+        (3 * z**7 + 19 * z**5 + 17 * z**3 - 15 * z) / 384,
+        (79 * z**9 + 776 * z**7 + 1482 * z**5 - 1920 * z**3 - 945 * z) / 92160,
+    ]
+    return z + sum(term / dof**(k + 1) for k, term in enumerate(terms))
+
+
+def confidence_half_width(samples: np.ndarray, hits: int) -> float:
+    """Student-t confidence interval half-width of the mean of <samples>.
+
+    With no hits the sample variance says nothing about the estimator: the interval
+    is unbounded (inf), not zero-width.
+
+    :param <samples>: independent samples (e.g. weighted indicators)
+    :param <hits>: number of samples where the event happened
+    """
+
+    if hits == 0 or len(samples) < 2:
+        return math.inf
+
+    quantile = student_t_quantile((1 + RARE_CONFIDENCE) / 2, len(samples) - 1)
+    return quantile * float(samples.std(ddof=1)) / math.sqrt(len(samples))
+
+
+def importance_sampling(threshold: float = IS_WAIT_THRESHOLD, tilted: float = None) -> tuple:
+    """Estimates P(max entrance wait >= threshold) sampling early arrivals at a tilted rate.
+
+    A fraction IS_DEFENSIVE of the runs keeps the nominal rate, and every run is weighted
+    by the likelihood ratio of the mixture: runs hitting the threshold through other
+    causes than arrivals (e.g. maintenance) cannot get a huge weight.
+
+    :param <threshold>: entrance wait threshold (hours)
+    :param <tilted>: tilted arrival rate (None: chosen by cross-entropy)
+    :return: tuple (estimate, confidence interval half-width (inf with no hits), tilted lambda)
+    """
+
+    with multiprocessing.Pool(
+        RARE_WORKERS,
+        initializer=logging.disable,
+        initargs=(logging.CRITICAL,)) as pool:
+        if tilted is None:
+            tilted, _ = cross_entropy_tilt(pool, threshold)
+
+        window = is_window(threshold)
+        nominal = round(IS_DEFENSIVE * IS_RUNS)
+        tasks = [
+            (main.SHIP_ARRIVAL_LAMBDA if i < nominal else tilted, window, RARE_SEED - IS_RUNS + i)
+            for i in range(IS_RUNS)]
+        results = np.array(pool.map(is_replication, tasks))
+
+    waits, n, exposure = results.T
+    samples = (waits >= threshold) * mixture_weights(n, exposure, tilted, nominal / IS_RUNS)
+    hits = int(np.sum(waits >= threshold))
+    estimate = float(samples.mean())
+    half_width = confidence_half_width(samples, hits)
+
+    rare_event_logger.info(
+        f'[IS]: P(ENTRANCE_WAIT >= {threshold}): {estimate}, '
+        f'CI: +/- {half_width}, Hits: {hits}/{IS_RUNS}, '
+        f'Lambda: {main.SHIP_ARRIVAL_LAMBDA} -> {tilted} up to {window}')
+    if hits < RARE_MIN_HITS:
+        rare_event_logger.warning(
+            f'[IS]: Only {hits} hits, the confidence interval is not reliable')
+
+    return estimate, half_width, tilted
+
+
+# -------------------------
+# MULTILEVEL SPLITTING
+# -------------------------
+
+def ships_waiting(am: SystemMonitor) -> int:
+    return am.n_ships_waiting + am.n_special_ships_waiting
+
+
+def forked(function, *args):
+    """Runs <function> in a copy (fork) of this process, returning its (picklable) result.
+
+    The copy starts from the current state of the running simulation, which cannot be
+    pickled (SimPy processes are generators), and the state of this process is unchanged.
+
+    :param <function>: function to run
+    :param <args>: arguments of the function
+    """
+
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        status = 1
+        try:
+            with os.fdopen(write_fd, 'wb') as f:
+                pickle.dump(function(*args), f)
+            status = 0
+        except BaseException:
+            traceback.print_exc()
+        finally:
+            os._exit(status)
+
+    os.close(write_fd)
+    with os.fdopen(read_fd, 'rb') as f:
+        data = f.read()
+    _, status = os.waitpid(pid, 0)
+    if status != 0:
+        raise RuntimeError(f'forked process {pid} failed with status {status}')
+
+    return pickle.loads(data)
+
+
+def splitting_score(env: simpy.Environment, am: SystemMonitor) -> float:
+    """Importance function of the splitting: ships waiting, projected to the horizon.
+
+    The queue grows over the whole horizon, so the same number of ships waiting is
+    more promising early than late. The score is never below the ships waiting, so a
+    trajectory reaching the target crosses every (lower) level of the score first.
+    """
+
+    return ships_waiting(am) + SPLITTING_DRIFT * (RARE_HORIZON - env.now)
+
+
+def splitting_branch(
+    env: simpy.Environment,
+    am: SystemMonitor,
+    levels,
+    factors,
+    target: float,
+    k: int = 0) -> list:
+    """Continues a trajectory from the crossing of levels[k - 1] (k = 0: from its start).
+
+    When its score crosses levels[k] the trajectory is split in factors[k] copies, one
+    continuing in this process and the others in forked processes run one after the
+    other, so at most one process per level is alive. Past the last level, copies run
+    until the ships waiting reach the target or the horizon ends.
+
+    :param <env>: simulation (simpy) environment
+    :param <am>: SystemMonitor instance
+    :param <levels>: increasing levels of <splitting_score>
+    :param <factors>: copies made at the crossing of each level
+    :param <target>: ships waiting level defining the event (inf: run to the horizon)
+    :param <k>: next level to cross
+    :return: (peak score, peak ships waiting) of each copy past the last level
+    """
+
+    peak_score, peak_waiting = splitting_score(env, am), ships_waiting(am)
+    while env.peek() < RARE_HORIZON:
+        env.step()
+        peak_score = max(peak_score, splitting_score(env, am))
+        peak_waiting = max(peak_waiting, ships_waiting(am))
+
+        if k == len(levels):
+            if peak_waiting >= target:
+                return [(peak_score, peak_waiting)]
+            continue
+        if peak_score < levels[k]:
+            continue
+
+        seeds = [random.getrandbits(32) for _ in range(factors[k])]
+        peaks = []
+        for seed in seeds[1:]:
+            peaks += forked(_reseeded_branch, env, am, levels, factors, target, k + 1, seed)
+        random.seed(seeds[0])
+        return peaks + splitting_branch(env, am, levels, factors, target, k + 1)
+
+    return [(peak_score, peak_waiting)] if k == len(levels) else []
+
+
+def _reseeded_branch(env, am, levels, factors, target, k, seed):
+    random.seed(seed)
+    return splitting_branch(env, am, levels, factors, target, k)
+
+
+def splitting_run(task) -> list:
+    """Runs the splitting tree of one trajectory started from scratch (worker side).
+
+    :param <task>: tuple (levels, factors, target, seed)
+    :return: peaks returned by <splitting_branch>
+    """
+
+    levels, factors, target, seed = task
+    env, am = start_harbour(seed)
+    return splitting_branch(env, am, levels, factors, target)
+
+
+def splitting_levels(pool, target: float = SPLITTING_TARGET) -> tuple:
+    """Chooses the levels with a pilot, so that each stage hits about SPLITTING_RATIO.
+
+    Each iteration runs the trees of the levels found so far, continuing the copies
+    past the last one until the horizon. The next level is the (1 - SPLITTING_RATIO)
+    quantile of their peak scores, unless they already reach the target often enough.
+    At each level, 1 / (hit ratio of the next stage) copies are made.
+
+    :param <pool>: worker pool
+    :param <target>: ships waiting level defining the event
+    :return: tuple (levels, copies made at each level)
+    """
+
+    copies = round(1 / SPLITTING_RATIO)
+    levels, factors = [], []
+    while True:
+        seeds = range(
+            RARE_SEED + len(levels) * SPLITTING_PILOT_RUNS,
+            RARE_SEED + (len(levels) + 1) * SPLITTING_PILOT_RUNS)
+        tree_factors = factors + [copies] if levels else []
+        tasks = [(levels, tree_factors, math.inf, seed) for seed in seeds]
+        peaks = np.array([peak for peaks in pool.map(splitting_run, tasks) for peak in peaks])
+        if len(peaks) == 0:
+            rare_event_logger.warning(
+                f'[SPLITTING_PILOT]: No copy crossed level {levels[-1]}, '
+                f'the last stage may hit too rarely')
+            return levels, factors + [copies]
+
+        scores, waiting = peaks.T
+        hit_ratio = max(float(np.mean(waiting >= target)), 1 / len(peaks))
+        level = math.ceil(np.quantile(scores, 1 - SPLITTING_RATIO))
+        if levels:
+            level = max(level, levels[-1] + 1)
+
+        if hit_ratio >= SPLITTING_RATIO or level >= target or len(levels) == SPLITTING_MAX_LEVELS:
+            rare_event_logger.info(
+                f'[SPLITTING_PILOT]: Target: {target}, Hit ratio: {hit_ratio}, '
+                f'Copies: {len(peaks)}')
+            if levels:
+                factors.append(max(1, round(1 / hit_ratio)))
+            return levels, factors
+
+        ratio = max(float(np.mean(scores >= level)), 1 / len(peaks))
+        if levels:
+            factors.append(max(1, round(1 / ratio)))
+        levels.append(level)
+        rare_event_logger.info(
+            f'[SPLITTING_PILOT]: Level: {level}, Hit ratio: {ratio}, Copies: {len(peaks)}')
+
+
+def multilevel_splitting(target: float = SPLITTING_TARGET) -> tuple:
+    """Estimates P(ships waiting reaches <target> within the horizon) by fixed splitting.
+
+    Each repetition starts SPLITTING_RUNS trajectories, split in copies at each level
+    crossing: the fraction of copies reaching the target, divided by the copies made
+    along the way, is an unbiased estimate. Its confidence interval comes from the
+    independent repetitions.
+
+    :param <target>: ships waiting level defining the event
+    :return: tuple (estimate, confidence interval half-width (inf if never reached), levels)
+    """
+
+    rng = random.Random(RARE_SEED)
+    estimates = []
+
+    with multiprocessing.Pool(
+        RARE_WORKERS,
+        initializer=logging.disable,
+        initargs=(logging.CRITICAL,)) as pool:
+        levels, factors = splitting_levels(pool, target)
+        copies = SPLITTING_RUNS * math.prod(factors)
+
+        for _ in range(SPLITTING_REPETITIONS):
+            tasks = [
+                (levels, factors, target, rng.getrandbits(32)) for _ in range(SPLITTING_RUNS)]
+            peaks = [peak for peaks in pool.map(splitting_run, tasks) for peak in peaks]
+            estimates.append(sum(waiting >= target for _, waiting in peaks) / copies)
+
+    estimates = np.array(estimates)
+    hits = int(np.sum(estimates > 0))
+    estimate = float(estimates.mean())
+    half_width = confidence_half_width(estimates, hits)
+
+    rare_event_logger.info(
+        f'[SPLITTING]: P(SHIPS_WAITING >= {target}): {estimate}, '
+        f'CI: +/- {half_width}, Levels: {levels}, Copies: {factors}, '
+        f'Runs: {SPLITTING_RUNS}x{SPLITTING_REPETITIONS}')
+    if hits < SPLITTING_REPETITIONS / 2:
+        rare_event_logger.warning(
+            f'[SPLITTING]: Target reached in {hits}/{SPLITTING_REPETITIONS} repetitions, '
+            f'the confidence interval is not reliable')
+
+    return estimate, half_width, levels
+
+
+if __name__ == '__main__':
+    importance_sampling()
+    multilevel_splitting()
@@ -0,0 +1,160 @@
+import os
+import shutil
+import tempfile
+import zlib
+
+import numpy as np
+
+# -------------------------
+# RECORDER CONFIGURATION
+# -------------------------
+SPILL_PATH = 'harbour-simulation/data/spill/'
+SPILL_MEMORY_BUDGET = 16 * 1024 * 1024 # (bytes, shared by all series)
+SPILL_COMPRESSION_LEVEL = 6
+
+
+class SpillSeries:
+    """Fixed-size ring buffer of float rows, flushed to compressed segments on disk when full.
+
+    It exposes the same <append> used on the plain lists of SystemMonitor, while
+    <iter_chunks> streams the whole history back one segment at a time.
+    """
+
+    # Attributes
+    name: str
+    width: int # values per row (e.g. 2 for (time, value))
+    rows: int # rows held in memory before a flush
+    n_segments: int # segments already flushed to disk
+    n_rows: int # total rows recorded
+
+    def __init__(self, name: str, width: int, rows: int, path: str = SPILL_PATH):
+        """Initializes the class.
+
+        :param <name>: series name, used as segments file prefix
+        :param <width>: number of values per row
+        :param <rows>: capacity (in rows) of the in-memory buffer
+        :param <path>: directory where segments are written (see <new_spill_dir>)
+        """
+
+        self.name = name
+        self.width = width
+        self.rows = max(1, rows)
+        self.path = path
+
+        self.buffer = np.empty((self.rows, self.width), dtype=np.float64)
+        self.filled = 0
+        self.n_segments = 0
+        self.n_rows = 0
+
+        os.makedirs(self.path, exist_ok=True)
+
+    def __len__(self):
+        return self.n_rows
+
+    def append(self, row):
+        """Append a row (a scalar or a tuple of <width> values), flushing the buffer if full.
+
+        :param <row>: row to append
+        """
+
+        self.buffer[self.filled] = row
+        self.filled += 1
+        self.n_rows += 1
+
+        if self.filled == self.rows:
+            self.flush()
+
+    def extend(self, rows: np.ndarray):
+        """Append a block of rows, flushing the buffer each time it is full.
+
+        :param <rows>: array of shape (n, width)
+        """
+
+        rows = np.asarray(rows, dtype=np.float64).reshape(-1, self.width)
+        while len(rows):
+            n = min(len(rows), self.rows - self.filled)
+            self.buffer[self.filled:self.filled + n] = rows[:n]
+            self.filled += n
+            self.n_rows += n
+            rows = rows[n:]
+
+            if self.filled == self.rows:
+                self.flush()
+
+    def flush(self):
+        """Write the filled part of the buffer as a new compressed segment."""
+
+        if self.filled == 0:
+            return
+
+        data = zlib.compress(
+            self.buffer[:self.filled].tobytes(), SPILL_COMPRESSION_LEVEL)
+        with open(self._segment_file(self.n_segments), 'wb') as f:
+            f.write(data)
+
+        self.n_segments += 1
+        self.filled = 0
+
+    def iter_chunks(self):
+        """Yield the recorded history as <(n, width)> arrays, one segment at a time."""
+
+        for i in range(self.n_segments):
+            with open(self._segment_file(i), 'rb') as f:
+                data = zlib.decompress(f.read())
+            yield np.frombuffer(data, dtype=np.float64).reshape(-1, self.width)
+
+        if self.filled:
+            yield self.buffer[:self.filled]
+
+    def _segment_file(self, i: int) -> str:
+        return os.path.join(self.path, f'{self.name}.{i:06d}.seg')
+
+
+def new_spill_dir(path: str = SPILL_PATH) -> str:
+    """Create a private directory for the segments of one run, so concurrent runs never share files.
+
+    :param <path>: parent directory of the runs directories
+    """
+
+    os.makedirs(path, exist_ok=True)
+    return tempfile.mkdtemp(prefix='run-', dir=path)
+
+
+def remove_spill_dir(path: str):
+    """Remove the directory of a run, with all its segments.
+
+    :param <path>: directory returned by <new_spill_dir>
+    """
+
+    shutil.rmtree(path, ignore_errors=True)
+
+
+def iter_chunks(series):
+    """Yield chunks of a series, either a plain list or a <SpillSeries>.
+
+    :param <series>: list of rows or SpillSeries instance
+    """
+
+    if isinstance(series, SpillSeries):
+        yield from series.iter_chunks()
+    elif series:
+        yield np.asarray(series, dtype=np.float64)
+
+
+def summary(series):
+    """Compute (min, max, avg) of a scalar series streaming over its chunks.
+
+    :param <series>: list of values or SpillSeries instance
+    """
+
+    min_val, max_val, total, n = float('inf'), float('-inf'), 0.0, 0
+    for chunk in iter_chunks(series):
+        min_val = min(min_val, float(chunk.min()))
+        max_val = max(max_val, float(chunk.max()))
+        total += float(chunk.sum())
+        n += chunk.size
+
+    if n == 0:
+        raise ValueError('summary of an empty series')
+
+    return min_val, max_val, total / n
@@ -0,0 +1,61 @@
+import logging
+import time
+
+import numpy as np
+
+import main
+from lifecycle import ARRIVAL, DOCK_GRANTED
+from logger import arrival_logger, dock_logger, queues_logger, stress_logger
+
+# -------------------------
+# STRESS CONFIGURATION
+# -------------------------
+STRESS_DOCKS = 20_000
+STRESS_TUGS = 20_000
+STRESS_FUEL_BARGES = 20_000
+STRESS_DOCK_HOLDING_TIME = 6 # (hours, approx. time a ship keeps a dock)
+STRESS_OVERLOAD = 1.5 # arrival rate / docks service rate
+STRESS_SIM_TIME = 12 # (hours in real world)
+STRESS_SEED = 42
+STRESS_ALLOCATORS = ['scalable', 'priority']
+
+
+def run_stress(allocator: str):
+    """Runs an overloaded mega-port, where tens of thousands of ships queue for docks.
+
+    :param <allocator>: docks allocator ('scalable' or 'priority')
+    :return: tuple (wall time, ships arrived, max. ships waiting a dock)
+    """
+
+    main.DOCK_ALLOCATOR = allocator
+    main.N_DOCKS = STRESS_DOCKS
+    main.N_TUGS = STRESS_TUGS
+    main.N_FUEL_BARGES = STRESS_FUEL_BARGES
+    main.SHIP_ARRIVAL_LAMBDA = STRESS_OVERLOAD * STRESS_DOCKS / STRESS_DOCK_HOLDING_TIME
+
+    start = time.perf_counter()
+    am = main.run_simulation(sim_time=STRESS_SIM_TIME, seed=STRESS_SEED)
+    wall_time = time.perf_counter() - start
+
+    # Ships waiting a dock over time, from arrivals (+1) and dock grants (-1)
+    _, _, times = am.lifecycle.records()
+    grants = times[:, DOCK_GRANTED]
+    grants = grants[~np.isnan(grants)]
+    events = np.concatenate([times[:, ARRIVAL], grants])
+    steps = np.concatenate([np.ones(len(times)), -np.ones(len(grants))])
+    max_waiting = int(np.cumsum(steps[np.argsort(events, kind='stable')]).max())
+
+    return wall_time, len(am.lifecycle), max_waiting
+
+
+if __name__ == '__main__':
+
+    # Per-ship events of millions of ships are not logged
+    for logger in (arrival_logger, dock_logger, queues_logger):
+        logger.setLevel(logging.WARNING)
+
+    for allocator in STRESS_ALLOCATORS:
+        wall_time, n_ships, max_waiting = run_stress(allocator)
+        stress_logger.info(
+            f'[{allocator.upper()}]: Docks: {STRESS_DOCKS}, Ships: {n_ships}, '
+            f'Max. waiting a dock: {max_waiting}, Wall time: {wall_time:.2f}s')
@@ -1,12 +1,29 @@
 import matplotlib.pyplot as plt
 import simpy
-from statistics import mean
 
+from histogram import WaitHistogram
+from lifecycle import ShipLifecycleTable
 from logger import queues_logger
+from recorder import (SPILL_MEMORY_BUDGET, SpillSeries, iter_chunks, new_spill_dir,
+                      remove_spill_dir, summary)
 
 # Files
 PLOTS_PATH = 'harbour-simulation/data/plots/'
 
+# Plotting
+PLOT_MAX_POINTS_PER_CHUNK = 10_000
+
+# Recorded series: (time, value) states and scalar waiting times
+STATE_SERIES = [
+    'ships_system', 'ships_waiting', 'special_ships_waiting', 'tugs_in_use',
+    'docks_in_use', 'ships_supplied', 'tugs_in_maintenance', 'ships_docked',
+    'ships_waiting_bunkering', 'ships_bunkering', 'barges_in_use']
+WAIT_SERIES = ['entrance_queue', 'bunkering_queue', 'exit_queue']
+
+# Waiting times histograms, recorded overall and per priority
+WAIT_HISTOGRAMS = ['ENTRANCE_WAIT', 'BUNKERING_WAIT', 'EXIT_WAIT']
+PERCENTILES = [50, 95, 99, 99.9]
+
 
 class SystemMonitor:
     """Class for monitoring environment state and resource usage."""
@@ -28,38 +45,36 @@ class SystemMonitor:
     n_ships_supplied = 0
     n_tugs_in_maintenance = 0
 
-    ships_system = []
-    ships_waiting = []
-    special_ships_waiting = []
-    tugs_in_use = []
-    docks_in_use = []
-    ships_supplied = []
-    tugs_in_maintenance = []
-
     # Docks states
     n_ships_docked = 0
     n_ships_waiting_bunkering = 0
     n_ships_bunkering = 0
     n_barges_in_use = 0
 
-    ships_docked = []
-    ships_waiting_bunkering = []
-    ships_bunkering = []
-    barges_in_use = []
+    # Waiting times histograms: (name, priority) -> histogram, priority None for all ships
+    wait_histograms: dict
 
-    # Queues wait times
-    entrance_queue = []
-    bunkering_queue = []
-    exit_queue = []
+    # Per-ship lifecycle records
+    lifecycle: ShipLifecycleTable
 
+    # Directory of the spilled segments of this run (None: not spilling)
+    spill_dir: str = None
 
-    def init(self, env: simpy.Environment, sim_docks: int, sim_tugs: int, sim_barges: int):
+
+    def init(
+        self, 
+        env: simpy.Environment, 
+        sim_docks: int, 
+        sim_tugs: int, 
+        sim_barges: int, 
+        spill: bool = False):
         """Initializes the class.
 
         :param <env>: simulation (simpy) environment
         :param <sim_docks>: number of docks of current simulation
         :param <sim_tugs>: number of tugs of current simulation
         :param <sim_barges>: number of barges of current simulation
+        :param <spill>: if true, record series in fixed-size buffers spilled to disk
         """
 
         self.env = env
@@ -68,6 +83,18 @@ class SystemMonitor:
         self.sim_tugs = sim_tugs
         self.sim_barges = sim_barges
 
+        # Fresh series for this run, bounded by SPILL_MEMORY_BUDGET if spilling
+        row_bytes = 8 * (2*len(STATE_SERIES) + len(WAIT_SERIES))
+        rows = SPILL_MEMORY_BUDGET // row_bytes
+        self.spill_dir = new_spill_dir() if spill else None
+        for name in STATE_SERIES:
+            setattr(self, name, SpillSeries(name, 2, rows, self.spill_dir) if spill else [])
+        for name in WAIT_SERIES:
+            setattr(self, name, SpillSeries(name, 1, rows, self.spill_dir) if spill else [])
+
+        self.wait_histograms = {}
+        self.lifecycle = ShipLifecycleTable(env, spill_dir=self.spill_dir)
+
         self.ships_system.append((self.env.now, self.n_ships_system))
         self.ships_waiting.append((self.env.now, self.n_ships_waiting))
         self.tugs_in_use.append((self.env.now, self.n_tugs_in_use))
@@ -81,26 +108,60 @@ class SystemMonitor:
         self.docks_in_use.append((self.env.now, self.n_ships_bunkering))
         self.barges_in_use.append((self.env.now, self.n_barges_in_use))
 
-    def add_to_entrance_queue(self, wait_time: float):
+    def close(self):
+        """Remove the segments spilled by this run, once plots and reports are done."""
+
+        if self.spill_dir is not None:
+            remove_spill_dir(self.spill_dir)
+            self.spill_dir = None
+
+    def add_to_entrance_queue(self, wait_time: float, prio: int = None):
         """Add entry to entrance waiting times list (obtained a dock && a tug).
 
         :param <wait_time>: the time waited by a ship before starting docking
+        :param <prio>: priority of the ship (None: unknown)
         """
         self.entrance_queue.append(wait_time)
+        self.record_wait('ENTRANCE_WAIT', wait_time, prio)
 
-    def add_to_bunkering_queue(self, wait_time: float):
+    def add_to_bunkering_queue(self, wait_time: float, prio: int = None):
         """Add entry to bunkering waiting times list (obtained a barge).
 
         :param <wait_time>: the time waited by a ship before starting bunkering
+        :param <prio>: priority of the ship (None: unknown)
         """
         self.bunkering_queue.append(wait_time)
+        self.record_wait('BUNKERING_WAIT', wait_time, prio)
 
-    def add_to_exit_queue(self, wait_time: float):
+    def add_to_exit_queue(self, wait_time: float, prio: int = None):
         """Add entry to exit waiting times list (obtained a tug).
 
         :param <wait_time>: the time waited by a ship before starting to exit
+        :param <prio>: priority of the ship (None: unknown)
         """
         self.exit_queue.append(wait_time)
+        self.record_wait('EXIT_WAIT', wait_time, prio)
+
+    def record_wait(self, name: str, wait_time: float, prio: int = None):
+        """Record a waiting time in the overall and per priority histograms of a queue.
+
+        :param <name>: queue name (one of WAIT_HISTOGRAMS)
+        :param <wait_time>: the time waited by a ship
+        :param <prio>: priority of the ship (None: unknown)
+        """
+
+        for key in ((name, None), (name, prio)) if prio is not None else ((name, None),):
+            if key not in self.wait_histograms:
+                self.wait_histograms[key] = WaitHistogram()
+            self.wait_histograms[key].record(wait_time)
+
+    def dump_wait_histograms(self) -> dict:
+        """Serialize waiting times histograms, to be merged with the ones of other runs.
+
+        :return: dict (name, priority) -> bytes
+        """
+
+        return {key: h.to_bytes() for key, h in self.wait_histograms.items()}
 
     def new_ship(self, prio: int):
         """Store the state changes due to the arrival of a new ship.
@@ -173,6 +234,12 @@ class SystemMonitor:
         self.n_barges_in_use -=1
         self.barges_in_use.append((self.env.now, self.n_barges_in_use))
 
+    def bunkering_skipped(self):
+        """Store the state changes due to a ship docked with a full tank."""
+
+        self.n_ships_waiting_bunkering -= 1
+        self.ships_waiting_bunkering.append((self.env.now, self.n_ships_waiting_bunkering))
+
     def start_maintenance(self):
         """Store the state changes due to the beginning of a tug maintenance."""
 
@@ -216,25 +283,45 @@ class SystemMonitor:
         self.n_ships_system -= 1
         self.ships_system.append((self.env.now, self.n_ships_system))
 
+    def _plot_series(self, series, label: str, **kwargs):
+        """Plot a (time, value) series streaming over its chunks, as a single line.
+
+        :param <series>: list of (time, value) or SpillSeries instance
+        :param <label>: line label
+        """
+
+        line = None
+        last = None
+        for chunk in iter_chunks(series):
+            # Decimate large chunks, keeping the last point to join the next one
+            step = -(-len(chunk) // PLOT_MAX_POINTS_PER_CHUNK)
+            if step > 1:
+                chunk = chunk[list(range(0, len(chunk) - 1, step)) + [len(chunk) - 1]]
+            x, y = chunk[:, 0], chunk[:, 1]
+            if last is not None:
+                x, y = [last[0], *x], [last[1], *y]
+            last = (x[-1], y[-1])
+
+            if line is None:
+                line, = plt.plot(x, y, label=label, **kwargs)
+                kwargs['color'] = line.get_color()
+            else:
+                plt.plot(x, y, **kwargs)
+
     def plot_arrivals(self):
         """Plot results related to Arrivals sub-system."""
 
         # Plot arrivals
 
-        x, y = list(zip(*self.ships_system))
-        plt.plot(x, y, label='# of ships in the system')
+        self._plot_series(self.ships_system, label='# of ships in the system')
 
-        x, y = list(zip(*self.ships_waiting))
-        plt.plot(x, y, label='# of ships waiting')
+        self._plot_series(self.ships_waiting, label='# of ships waiting')
 
-        x, y = list(zip(*self.special_ships_waiting))
-        plt.plot(x, y, label='# of special ships waiting')
+        self._plot_series(self.special_ships_waiting, label='# of special ships waiting')
 
-        x, y = list(zip(*self.tugs_in_use))
-        plt.plot(x, y, label='# of tugs in use')
+        self._plot_series(self.tugs_in_use, label='# of tugs in use')
 
-        x, y = list(zip(*self.docks_in_use))
-        plt.plot(x, y, label='# docks in use')
+        self._plot_series(self.docks_in_use, label='# docks in use')
 
         #x, y = list(zip(*self.ships_supplied))
         #plt.plot(x, y, label='# of ships served')
@@ -254,8 +341,7 @@ class SystemMonitor:
         
         # Plot tugs maintenance
 
-        x, y = list(zip(*self.tugs_in_maintenance))
-        plt.plot(x, y, label='# of tugs in maintenance', color='grey')
+        self._plot_series(self.tugs_in_maintenance, label='# of tugs in maintenance', color='grey')
 
         plt.title('Tugs maintenance')
         plt.xlabel('Time step')
@@ -271,17 +357,13 @@ class SystemMonitor:
 
         # Plot docks
 
-        x, y = list(zip(*self.ships_docked))
-        plt.plot(x, y, label='# of ships docked')
+        self._plot_series(self.ships_docked, label='# of ships docked')
 
-        x, y = list(zip(*self.ships_waiting_bunkering))
-        plt.plot(x, y, label='# of ships waiting bunkering')
+        self._plot_series(self.ships_waiting_bunkering, label='# of ships waiting bunkering')
 
-        x, y = list(zip(*self.ships_bunkering))
-        plt.plot(x, y, label='# of ships bunkering')
+        self._plot_series(self.ships_bunkering, label='# of ships bunkering')
 
-        x, y = list(zip(*self.barges_in_use))
-        plt.plot(x, y, label='# of fuel barges in use')
+        self._plot_series(self.barges_in_use, label='# of fuel barges in use')
 
         plt.title('Docks situation')
         plt.xlabel('Time step')
@@ -299,22 +381,37 @@ class SystemMonitor:
         # Store waiting times (min., max., avg.)
 
         # For entering the harbour
-        min_val = min(self.entrance_queue)
-        max_val = max(self.entrance_queue)
-        avg = mean(self.entrance_queue)
+        min_val, max_val, avg = summary(self.entrance_queue)
         queues_logger.info(
             f'[ENTRANCE_WAIT]: Min.: {min_val}, Max.: {max_val}, Avg.: {avg}')
 
         # For bunkering
-        min_val = min(self.bunkering_queue)
-        max_val = max(self.bunkering_queue)
-        avg = mean(self.bunkering_queue)
+        min_val, max_val, avg = summary(self.bunkering_queue)
         queues_logger.info(
             f'[BUNKERING_WAIT]: Min.: {min_val}, Max.: {max_val}, Avg.: {avg}')
 
         # For exiting the harbour
-        min_val = min(self.exit_queue)
-        max_val = max(self.exit_queue)
-        avg = mean(self.exit_queue)
+        min_val, max_val, avg = summary(self.exit_queue)
         queues_logger.info(
-            f'[EXIT_WAIT]: Min.: {min_val}, Max.: {max_val}, Avg.: {avg}')
\ No newline at end of file
+            f'[EXIT_WAIT]: Min.: {min_val}, Max.: {max_val}, Avg.: {avg}')
+
+        # Percentiles, overall and per priority
+        for name in WAIT_HISTOGRAMS:
+            prios = sorted(p for n, p in self.wait_histograms if n == name and p is not None)
+            for prio in [None, *prios]:
+                h = self.wait_histograms.get((name, prio))
+                if h is None:
+                    continue
+
+                tag = f'[{name}]' if prio is None else f'[{name}][PRIORITY {prio}]'
+                values = ', '.join(f'P{q}: {h.percentile(q)}' for q in PERCENTILES)
+                queues_logger.info(f'{tag}: {values}')
+
+    def store_lifecycle_report(self):
+        """Stores in a log file the sojourn time breakdown (avg. and percentiles) of each priority class.
+        """
+
+        for prio, segments in self.lifecycle.report().items():
+            for segment, (n, avg, p50, p95, p99) in segments.items():
+                queues_logger.info(
+                    f'[SOJOURN][PRIORITY {prio}]: {segment}: N.: {n}, Avg.: {avg}, P50: {p50}, P95: {p95}, P99: {p99}')
@@ -0,0 +1,471 @@
+import asyncio
+import itertools
+import json
+import logging
+import math
+import multiprocessing
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
+
+import numpy as np
+import simpy
+import simpy.rt
+
+import main
+import objects.tug
+from histogram import WaitHistogram, merge_histograms
+from lifecycle import (ARRIVAL, BUNKERING_DONE, CARGO_DONE, DOCKING_DONE,
+                       EXIT_TUG_GRANTED, N_EVENTS, TUG_GRANTED)
+from objects.ship import Ship, SpecialShip
+from system_monitor import SystemMonitor
+
+# -------------------------
+# TWIN CONFIGURATION
+# -------------------------
+TWIN_HOST = '127.0.0.1'
+TWIN_PORT = 8765
+TWIN_TIME_FACTOR = 3600 # (real seconds per simulated hour)
+TWIN_TICK = 1 # (real seconds between two advances of the twin)
+TWIN_SIMULATED_MAINTENANCE = False # if false, tugs maintenance comes from the feed
+
+FORECAST_HORIZON = 12 # (hours)
+FORECAST_REPLICATIONS = 64
+FORECAST_TIMEOUT = 3 # (real seconds)
+FORECAST_WORKERS = multiprocessing.cpu_count()
+FORECAST_PERCENTILES = [50, 90, 95, 99]
+FORECAST_DEADLINE_STEPS = 1000 # events simulated between two checks of the deadline
+
+# Priority of dock/tug requests restoring the state, served before any ship
+RESTORE_PRIORITY = -3
+
+# Ships stages in a snapshot
+ENTRANCE = 'entrance' # waiting for a dock or a tug
+DOCKING = 'docking' # being docked by a tug
+BERTHED = 'berthed' # docked, not yet leaving
+EXITING = 'exiting' # leaving with a tug
+
+
+class HarbourTwin:
+    """Digital twin of the harbour, tracking the real state from an events feed.
+
+    Events are newline-delimited JSON objects with a <type>:
+    - arrival: {"type": "arrival", "id", "priority", "fuel_capacity"?, "fuel_level"?}
+    - tug: {"type": "tug", "id", "status": "maintenance" | "available"}
+    - dock: {"type": "dock", "id", "status": "closed" | "open"}
+    - forecast: {"type": "forecast", "horizon"?, "replications"?}
+    """
+
+    # Environment
+    env: simpy.rt.RealtimeEnvironment
+
+    def __init__(self, pool: ProcessPoolExecutor):
+        """Initializes the class.
+
+        :param <pool>: worker pool running forecast replications
+        """
+
+        self.pool = pool
+
+        self.env = simpy.rt.RealtimeEnvironment(factor=TWIN_TIME_FACTOR, strict=False)
+        self.monitor = SystemMonitor()
+        self.monitor.init(
+            self.env, main.N_DOCKS, main.N_TUGS, main.N_FUEL_BARGES, spill=True)
+
+        # Ship processes of main.py report to the twin monitor
+        main.am = self.monitor
+        self.docks, self.tugs, self.fuel_barges = main.build_harbour(
+            self.env, self.monitor, maintenance=TWIN_SIMULATED_MAINTENANCE)
+
+        self.ships = {} # lifecycle row -> ship, for ships in the system
+        self.closed_docks = {} # dock id -> holding request
+
+    def advance(self):
+        """Run the twin up to the current (real) time."""
+
+        now = self.env.env_start + (time.monotonic() - self.env.real_start) / self.env.factor
+        if now > self.env.now:
+            self.env.run(until=now)
+
+    async def run(self):
+        """Periodically advance the twin."""
+
+        while True:
+            self.advance()
+            await asyncio.sleep(TWIN_TICK)
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve a feed connection, answering each event with a JSON line."""
+
+        while line := await reader.readline():
+            try:
+                reply = await self.handle_event(json.loads(line))
+            except Exception as e:
+                reply = {'ok': False, 'error': f'{type(e).__name__}: {e}'}
+
+            writer.write(json.dumps(reply).encode() + b'\n')
+            await writer.drain()
+
+        writer.close()
+
+    async def handle_event(self, event: dict) -> dict:
+        """Apply an event to the twin state, or answer a forecast request.
+
+        :param <event>: decoded event
+        """
+
+        self.advance()
+
+        if event['type'] == 'arrival':
+            ship_class = Ship if event.get('priority', 0) == 0 else SpecialShip
+            s = ship_class(
+                event['id'], event.get('fuel_capacity'), event.get('fuel_level'))
+            main.ship_arrived(self.env, s, self.docks, self.tugs, self.fuel_barges)
+            self.ships[s.record] = s
+
+        elif event['type'] == 'tug':
+            if event['status'] == 'maintenance':
+                self.tugs.scheduler.take_out(event['id'])
+            else:
+                self.tugs.scheduler.bring_back(event['id'])
+
+        elif event['type'] == 'dock':
+            if event['status'] == 'closed':
+                if event['id'] not in self.closed_docks:
+                    self.closed_docks[event['id']] = self.docks.request(
+                        priority=RESTORE_PRIORITY)
+            elif event['id'] in self.closed_docks:
+                request = self.closed_docks.pop(event['id'])
+                if request.triggered:
+                    self.docks.release(request)
+                else:
+                    request.cancel()
+
+        elif event['type'] == 'forecast':
+            return await self.forecast(
+                event.get('horizon', FORECAST_HORIZON),
+                event.get('replications', FORECAST_REPLICATIONS))
+
+        else:
+            raise ValueError(f"Unknown event type: {event['type']}")
+
+        return {'ok': True, 'time': self.env.now}
+
+    def snapshot(self) -> dict:
+        """Compact, picklable description of the current state, relative to now.
+
+        Each ship comes with its lifecycle timestamps (NaN: not happened yet).
+        """
+
+        lifecycle = self.monitor.lifecycle
+        ships = []
+        for row, s in list(self.ships.items()):
+            if lifecycle.exited(row):
+                del self.ships[row]
+                continue
+
+            times = tuple(lifecycle.time(row, event) - self.env.now for event in range(N_EVENTS))
+            if np.isnan(times[TUG_GRANTED]):
+                stage = ENTRANCE
+            elif np.isnan(times[DOCKING_DONE]):
+                stage = DOCKING
+            elif np.isnan(times[EXIT_TUG_GRANTED]):
+                stage = BERTHED
+            else:
+                stage = EXITING
+
+            ships.append((s.id, s.priority, s.fuel_capacity, s.fuel_level, stage, times))
+
+        closed = sum(request.triggered for request in self.closed_docks.values())
+        return {
+            'ships': ships,
+            'tugs_in_maintenance': len(self.tugs.scheduler.in_maintenance),
+            'closed_docks': closed,
+            'closing_docks': len(self.closed_docks) - closed, # closed once their ships leave
+        }
+
+    async def forecast(self, horizon: float, replications: int) -> dict:
+        """Run accelerated replications from the current state, within FORECAST_TIMEOUT.
+
+        :param <horizon>: forecast horizon (hours)
+        :param <replications>: number of replications
+        """
+
+        start = time.monotonic()
+        snapshot = self.snapshot()
+
+        # Running replications stop by themselves at the deadline, queued ones are cancelled
+        deadline = time.time() + FORECAST_TIMEOUT
+        loop = asyncio.get_running_loop()
+        futures = [
+            loop.run_in_executor(
+                self.pool, forecast_replication,
+                snapshot, horizon, random.getrandbits(32), deadline)
+            for _ in range(replications)]
+        done, pending = await asyncio.wait(futures, timeout=FORECAST_TIMEOUT)
+        for future in pending:
+            future.cancel()
+
+        results, errors, timed_out = [], [], len(pending)
+        for future in done:
+            if future.exception() is None:
+                results.append(future.result())
+            elif isinstance(future.exception(), TimeoutError):
+                timed_out += 1
+            else:
+                errors.append(f'{type(future.exception()).__name__}: {future.exception()}')
+
+        # Merge the entrance waits histograms of completed replications
+        keys = {key for histograms, _ in results for key in histograms}
+        entrance_wait = {}
+        for key in sorted(keys, key=str):
+            h = merge_histograms(
+                histograms[key] for histograms, _ in results if key in histograms)
+            entrance_wait['all' if key is None else str(key)] = {
+                f'p{q}': h.percentile(q) for q in FORECAST_PERCENTILES}
+
+        reply = {
+            'ok': len(results) > 0,
+            'time': self.env.now,
+            'horizon': horizon,
+            'replications': len(results),
+            'requested': replications,
+            'failed': len(errors),
+            'timed_out': timed_out,
+            'entrance_wait': entrance_wait,
+            'censored': sum(c for _, c in results) / len(results) if results else None,
+            'latency': time.monotonic() - start,
+        }
+        if errors:
+            reply['errors'] = sorted(set(errors))
+        if not results:
+            reply['error'] = 'no replication completed'
+
+        return reply
+
+
+def forecast_replication(
+    snapshot: dict, horizon: float, seed: int, deadline: float = None) -> tuple:
+    """Runs one replication from a snapshot of the twin (worker side).
+
+    Docking, cargo and un-docking in progress last a residual time sampled given the
+    time already spent, a bunkering in progress restarts for the fuel still missing.
+    Maintenance durations are exponential, so their residuals are sampled afresh.
+
+    :param <snapshot>: state returned by <HarbourTwin.snapshot>
+    :param <horizon>: forecast horizon (hours)
+    :param <seed>: seed of the random generator
+    :param <deadline>: wall-clock time (time.time) after which TimeoutError is raised
+    :return: tuple (dict priority (None: all) -> serialized entrance waits histogram,
+        n. of ships still waiting at the horizon)
+    """
+
+    random.seed(seed)
+
+    am = SystemMonitor()
+    env = simpy.Environment()
+    am.init(env, main.N_DOCKS, main.N_TUGS, main.N_FUEL_BARGES)
+    main.am = am
+    docks, tugs, fuel_barges = main.build_harbour(env, am)
+
+    restore_state(env, snapshot, docks, tugs, fuel_barges)
+    env.process(main.ship_arrival(env, docks, tugs, fuel_barges))
+    for i in itertools.count():
+        if env.peek() >= horizon:
+            break
+        if deadline is not None and i % FORECAST_DEADLINE_STEPS == 0 and time.time() > deadline:
+            raise TimeoutError(f'replication stopped at {env.now:.3f} of {horizon}')
+        env.step()
+
+    # Entrance waits of ships that obtained a tug within the horizon, and of ships
+    # still waiting at its end, censored at the horizon
+    _, priorities, times = am.lifecycle.records()
+    censored = np.isnan(times[:, TUG_GRANTED])
+    selected = censored | (times[:, TUG_GRANTED] >= 0)
+    granted = np.where(censored, horizon, times[:, TUG_GRANTED])
+    waits = (granted - times[:, ARRIVAL])[selected]
+    priorities = priorities[selected]
+
+    histograms = {}
+    for wait, prio in zip(waits.tolist(), priorities.tolist()):
+        for key in (None, prio):
+            if key not in histograms:
+                histograms[key] = WaitHistogram()
+            histograms[key].record(wait)
+
+    return {key: h.to_bytes() for key, h in histograms.items()}, int(censored.sum())
+
+
+def restore_state(env: simpy.Environment, snapshot: dict, docks, tugs, fuel_barges):
+    """Recreates the snapshot state at the beginning of a forecast replication.
+
+    :param <env>: simulation (simpy) environment
+    :param <snapshot>: state returned by <HarbourTwin.snapshot>
+    :param <docks>: docks resource
+    :param <tugs>: MyPriorityFilterStore resource instance
+    :param <fuel_barges>: simpy Store resource instance
+    """
+
+    # Docks and tugs already taken are requested first, with the highest priority
+    # (same priority requests are granted in order)
+    for _ in range(snapshot['closed_docks']):
+        docks.request(priority=RESTORE_PRIORITY)
+
+    for _ in range(snapshot['tugs_in_maintenance']):
+        env.process(hold_tug(
+            env, tugs, random.expovariate(objects.tug.TUG_MAINTENANCE_LAMBDA)))
+
+    waiting = []
+    for id, priority, fuel_capacity, fuel_level, stage, times in snapshot['ships']:
+        ship_class = Ship if priority == 0 else SpecialShip
+        s = ship_class(id, fuel_capacity, fuel_level)
+        s.record = main.am.lifecycle.open(s.id, s.priority, time=times[ARRIVAL])
+        for event, t in enumerate(times):
+            if event != ARRIVAL and not math.isnan(t):
+                main.am.lifecycle.stamp(s.record, event, t)
+
+        if stage == ENTRANCE:
+            waiting.append(s)
+        elif stage == DOCKING:
+            dock = docks.request(priority=RESTORE_PRIORITY)
+            env.process(resume_docking(
+                env, s, docks, dock, tugs, fuel_barges, -times[TUG_GRANTED]))
+        elif stage == BERTHED:
+            dock = docks.request(priority=RESTORE_PRIORITY)
+            env.process(resume_berthed(env, s, docks, dock, tugs, fuel_barges, times))
+        else:
+            env.process(hold_tug(env, tugs, residual_time(
+                objects.tug.DOCKING_TIME_MEAN, objects.tug.DOCKING_TIME_STD,
+                -times[EXIT_TUG_GRANTED])))
+
+    # Docks to be closed wait for the ships holding them, then come before any entrance
+    for _ in range(snapshot['closing_docks']):
+        docks.request(priority=RESTORE_PRIORITY)
+
+    # Ships waiting to enter queue again, in arrival order
+    for s in waiting:
+        main.am.new_ship(s.priority)
+        env.process(main.ship_docking(env, s, docks, tugs, fuel_barges))
+
+
+def resume_docking(
+    env: simpy.Environment, s: Ship, docks, dock, tugs, fuel_barges, elapsed: float):
+    """Resumes the docking of a ship, holding its tug until the docking is completed.
+
+    :param <env>: simulation (simpy) environment
+    :param <s>: Ship class instance
+    :param <docks>: docks resource
+    :param <dock>: dock request of the ship
+    :param <tugs>: MyPriorityFilterStore resource instance
+    :param <fuel_barges>: simpy Store resource instance
+    :param <elapsed>: time since the docking started
+    """
+
+    yield dock
+    tug = yield tugs.get(priority=RESTORE_PRIORITY)
+    main.am.new_ship(s.priority)
+    main.am.start_docking(s.priority)
+
+    yield env.timeout(residual_time(
+        objects.tug.DOCKING_TIME_MEAN, objects.tug.DOCKING_TIME_STD, elapsed))
+
+    main.am.docking_completed()
+    main.am.lifecycle.stamp(s.record, DOCKING_DONE)
+    yield tugs.put(tug)
+
+    yield env.process(main.ship_at_dock(env, s, docks, dock, tugs, fuel_barges))
+
+
+def resume_berthed(env: simpy.Environment, s: Ship, docks, dock, tugs, fuel_barges, times):
+    """Resumes cargo and bunkering (unless already completed) and exit of a docked ship.
+
+    :param <env>: simulation (simpy) environment
+    :param <s>: Ship class instance
+    :param <docks>: docks resource
+    :param <dock>: dock request of the ship
+    :param <tugs>: MyPriorityFilterStore resource instance
+    :param <fuel_barges>: simpy Store resource instance
+    :param <times>: lifecycle timestamps of the ship, relative to now
+    """
+
+    yield dock
+    main.am.new_ship(s.priority)
+    main.am.start_docking(s.priority)
+    main.am.docking_completed()
+
+    phases = []
+    if math.isnan(times[CARGO_DONE]):
+        phases.append(env.process(resume_cargo(env, s, -times[DOCKING_DONE])))
+    if math.isnan(times[BUNKERING_DONE]):
+        phases.append(env.process(main.ship_bunkering(env, s, fuel_barges)))
+    else:
+        main.am.bunkering_skipped()
+    yield env.all_of(phases)
+
+    yield env.process(main.ship_leaving(env, s, docks, dock, tugs))
+
+
+def resume_cargo(env: simpy.Environment, s: Ship, elapsed: float):
+    """Completes the cargo loading/unloading of a ship.
+
+    :param <env>: simulation (simpy) environment
+    :param <s>: Ship class instance
+    :param <elapsed>: time since the cargo started
+    """
+
+    yield env.timeout(residual_time(main.CARGO_TIME_MEAN, main.CARGO_TIME_STD, elapsed))
+    main.am.lifecycle.stamp(s.record, CARGO_DONE)
+
+
+def residual_time(mean: float, std: float, elapsed: float) -> float:
+    """Samples the remaining duration of a gaussian phase, given it already lasted <elapsed>.
+
+    :param <mean>: mean of the phase duration
+    :param <std>: standard deviation of the phase duration
+    :param <elapsed>: time already spent in the phase
+    """
+
+    duration = NormalDist(mean, std)
+    low = duration.cdf(elapsed)
+    u = low + random.random() * (1 - low)
+
+    # Phase overdue beyond numerical precision: it ends now
+    if not 0 < u < 1:
+        return 0.0
+
+    return max(duration.inv_cdf(u) - elapsed, 0.0)
+
+
+def hold_tug(env: simpy.Environment, tugs, duration: float):
+    """Keeps a tug busy, for a maintenance or an un-docking.
+
+    :param <env>: simulation (simpy) environment
+    :param <tugs>: MyPriorityFilterStore resource instance
+    :param <duration>: time the tug is kept
+    """
+
+    tug = yield tugs.get(priority=RESTORE_PRIORITY)
+    yield env.timeout(duration)
+    yield tugs.put(tug)
+
+
+async def serve():
+    """Starts the twin and its feed server."""
+
+    with ProcessPoolExecutor(
+        FORECAST_WORKERS,
+        initializer=logging.disable,
+        initargs=(logging.CRITICAL,)) as pool:
+        twin = HarbourTwin(pool)
+        server = await asyncio.start_server(twin.handle_client, TWIN_HOST, TWIN_PORT)
+
+        try:
+            async with server:
+                await asyncio.gather(twin.run(), server.serve_forever())
+        finally:
+            twin.monitor.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(serve())
@@ -0,0 +1,14 @@
+import logging
+import os
+import sys
+import tempfile
+
+# Simulation modules are imported as top-level modules
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'harbour-simulation'))
+
+# Loggers open their files (relative to the project root) at import: use a scratch root
+ROOT = tempfile.mkdtemp()
+os.makedirs(os.path.join(ROOT, 'harbour-simulation', 'data', 'logs'))
+os.chdir(ROOT)
+
+logging.disable(logging.CRITICAL)
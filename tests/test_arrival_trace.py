@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+import main
+from arrival_trace import TRACE_DTYPE, convert_trace, read_trace
+
+CSV = """arrival_time,priority,fuel_capacity,fuel_level
+0.5,0,100000,40000
+1.0,-1,50000,50000
+1.5,0,80000,90000
+2.0,0,60000,-10
+"""
+
+# Fuel levels are clipped into [0, fuel_capacity]
+RECORDS = [
+    (0.5, 0, 100000, 40000),
+    (1.0, -1, 50000, 50000),
+    (1.5, 0, 80000, 80000),
+    (2.0, 0, 60000, 0),
+]
+
+
+@pytest.fixture
+def csv_trace(tmp_path):
+    path = tmp_path / 'trace.csv'
+    path.write_text(CSV)
+    return str(path)
+
+
+@pytest.mark.parametrize('chunk_rows', [1, 3, 1000])
+def test_read_csv(csv_trace, chunk_rows):
+    assert list(read_trace(csv_trace, chunk_rows)) == RECORDS
+
+
+def test_convert_round_trip(csv_trace, tmp_path):
+    bin_path = str(tmp_path / 'trace.bin')
+    convert_trace(csv_trace, bin_path, chunk_rows=2)
+    assert list(read_trace(bin_path, chunk_rows=3)) == RECORDS
+
+    npy_path = str(tmp_path / 'trace.npy')
+    np.save(npy_path, np.fromfile(bin_path, dtype=TRACE_DTYPE))
+    assert list(read_trace(npy_path)) == RECORDS
+
+
+def test_invalid_record(tmp_path):
+    path = tmp_path / 'trace.csv'
+    path.write_text('0.5,0,100000,40000\nnan,0,100000,40000\n')
+    with pytest.raises(ValueError, match='record 1'):
+        list(read_trace(str(path)))
+
+
+@pytest.mark.parametrize('chunk_rows', [1, 2, 1000])
+def test_unsorted_record(tmp_path, chunk_rows):
+    path = tmp_path / 'trace.csv'
+    path.write_text('0.5,0,100000,40000\n1.5,0,100000,40000\n1.0,0,100000,40000\n')
+    with pytest.raises(ValueError, match='record 2'):
+        list(read_trace(str(path), chunk_rows))
+
+
+def test_unknown_priority(tmp_path):
+    path = tmp_path / 'trace.csv'
+    path.write_text('0.5,0,100000,40000\n1.0,1,100000,40000\n')
+    with pytest.raises(ValueError, match='record 1'):
+        list(read_trace(str(path)))
+
+
+def test_replay_full_tanks(csv_trace, monkeypatch):
+    monkeypatch.setattr(main, 'ARRIVAL_TRACE', csv_trace)
+    am = main.run_simulation(sim_time=48, seed=1)
+
+    assert len(am.lifecycle) == len(RECORDS)
+    assert am.n_ships_system == 0
+    assert am.n_ships_waiting_bunkering == 0
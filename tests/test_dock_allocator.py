@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+import simpy
+
+import main
+from objects.dock_allocator import ScalableDockResource
+
+
+def run_requests(docks, env, priorities, cancelled=()):
+    """One ship holds the only dock, the others queue and hold it for 1 hour each.
+
+    :return: ids of the granted requests, in grant order
+    """
+
+    granted = []
+
+    def ship(i, priority, delay):
+        yield env.timeout(delay)
+        with docks.request(priority=priority) as request:
+            if i in cancelled:
+                yield env.timeout(0.5)
+                return
+            yield request
+            granted.append(i)
+            yield env.timeout(1)
+
+    env.process(ship(None, 0, 0))
+    for i, priority in enumerate(priorities):
+        env.process(ship(i, priority, 0.1 * (i + 1)))
+    env.run()
+
+    return granted[1:]
+
+
+def test_priority_then_fifo():
+    env = simpy.Environment()
+    docks = ScalableDockResource(env, capacity=1)
+
+    granted = run_requests(docks, env, [0, -1, 0, -1, -2])
+    assert granted == [4, 1, 3, 0, 2]
+    assert docks.count == 0
+
+
+def test_cancel_queued():
+    env = simpy.Environment()
+    docks = ScalableDockResource(env, capacity=1)
+
+    # Cancelled requests leave the queue (on exiting the <with> block) and are never granted
+    granted = run_requests(docks, env, [0, -1, 0, -1], cancelled={1, 2})
+    assert granted == [3, 0]
+    assert docks.n_queued == 0
+
+    # Cancelling a granted request has no effect
+    request = docks.request()
+    env.run()
+    request.cancel()
+    assert not request.cancelled
+    assert docks.count == 1
+
+
+@pytest.mark.parametrize('capacity', [1, 3])
+def test_same_order_of_priority_resource(capacity):
+    priorities = [0, -1, 0, 0, -1, -2, 0, -2]
+
+    env = simpy.Environment()
+    expected = run_requests(simpy.PriorityResource(env, capacity), env, priorities, cancelled={3})
+    env = simpy.Environment()
+    granted = run_requests(ScalableDockResource(env, capacity), env, priorities, cancelled={3})
+
+    assert granted == expected
+
+
+def test_same_simulation_of_priority_resource(monkeypatch):
+    monkeypatch.setattr(main, 'N_DOCKS', 3)
+
+    records = []
+    for allocator in ('priority', 'scalable'):
+        monkeypatch.setattr(main, 'DOCK_ALLOCATOR', allocator)
+        am = main.run_simulation(sim_time=48, seed=0)
+        records.append(am.lifecycle.records())
+        am.close()
+
+    for expected, values in zip(*records):
+        assert np.array_equal(values, expected, equal_nan=True)
@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from doe import bootstrap_indices, sobol_indices, unit_design
+
+# Ishigami function (a=7, b=0.1) and its analytical indices
+ISHIGAMI_FIRST_ORDER = [0.3139, 0.4424, 0.0]
+ISHIGAMI_TOTAL = [0.5576, 0.4424, 0.2437]
+
+
+def ishigami(u):
+    x = -np.pi + 2 * np.pi * u
+    return np.sin(x[:, 0]) + 7 * np.sin(x[:, 1])**2 + 0.1 * x[:, 2]**4 * np.sin(x[:, 0])
+
+
+def test_ishigami_indices():
+    u = unit_design(1000, 3, 'lhs', seed=0)
+    first_order, total = sobol_indices(u, ishigami(u), degree=10)
+
+    assert first_order == pytest.approx(ISHIGAMI_FIRST_ORDER, abs=0.01)
+    assert total == pytest.approx(ISHIGAMI_TOTAL, abs=0.01)
+
+
+def test_additive_function():
+    u = unit_design(200, 3, 'lhs', seed=1)
+    first_order, total = sobol_indices(u, 2 * u[:, 0] + u[:, 1], degree=2)
+
+    # Var(2*u0) = 4 * Var(u1), u2 has no effect
+    assert first_order == pytest.approx([0.8, 0.2, 0.0], abs=1e-9)
+    assert total == pytest.approx(first_order, abs=1e-9)
+
+
+def test_bootstrap_intervals_contain_estimates():
+    rng = np.random.default_rng(2)
+    u = unit_design(256, 3, 'lhs', seed=2)
+    y = ishigami(u) + rng.normal(0, 0.5, len(u))
+
+    first_order, total = sobol_indices(u, y, degree=2)
+    first_order_ci, total_ci = bootstrap_indices(u, y, resamples=200)
+
+    assert np.all(first_order_ci[0] <= first_order) and np.all(first_order <= first_order_ci[1])
+    assert np.all(total_ci[0] <= total) and np.all(total <= total_ci[1])
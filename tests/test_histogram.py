@@ -0,0 +1,86 @@
+import random
+
+import numpy as np
+import pytest
+
+from histogram import WaitHistogram, merge_histograms
+
+
+def test_percentiles_precision():
+    rng = random.Random(0)
+    values = [rng.expovariate(0.5) for _ in range(20_000)]
+
+    h = WaitHistogram()
+    for value in values:
+        h.record(value)
+
+    assert len(h) == len(values)
+    assert h.mean() == pytest.approx(np.mean(values))
+    for q in (50, 95, 99, 99.9):
+        expected = np.percentile(values, q, method='inverted_cdf')
+        assert h.percentile(q) == pytest.approx(expected, rel=2e-3)
+    assert h.percentile(100) == max(values)
+
+
+def test_percentile_rounded_to_resolution():
+    h = WaitHistogram()
+    for value in (0.1, 0.8359, 2.0):
+        h.record(value)
+
+    value = h.percentile(50)
+    assert value == round(value, 4)
+
+
+def test_record_many():
+    rng = np.random.default_rng(2)
+    values = np.concatenate([rng.exponential(2, 5000), rng.uniform(0, 1e-3, 100), [-1.0, 0.0, 2e4]])
+
+    h = WaitHistogram()
+    for value in values.tolist():
+        h.record(value)
+
+    block = WaitHistogram()
+    block.record_many(values[:3000])
+    block.record_many(values[3000:])
+    block.record_many([])
+
+    assert np.array_equal(block.counts, h.counts)
+    assert (block.count, block.min, block.max) == (h.count, h.min, h.max)
+    assert block.sum == pytest.approx(h.sum)
+
+
+def test_merge_serialized():
+    rng = random.Random(1)
+    parts = [[rng.uniform(0, 50) for _ in range(1000)] for _ in range(3)]
+
+    whole = WaitHistogram()
+    histograms = []
+    for part in parts:
+        h = WaitHistogram()
+        for value in part:
+            h.record(value)
+            whole.record(value)
+        histograms.append(h)
+
+    merged = merge_histograms(h.to_bytes() for h in histograms)
+
+    assert np.array_equal(merged.counts, whole.counts)
+    assert (merged.count, merged.min, merged.max) == (whole.count, whole.min, whole.max)
+    assert merged.sum == pytest.approx(whole.sum)
+    for q in (50, 99):
+        assert merged.percentile(q) == whole.percentile(q)
+
+
+def test_round_trip():
+    h = WaitHistogram()
+    for value in (0.5, 3.25, 12.0):
+        h.record(value)
+
+    restored = WaitHistogram.from_bytes(h.to_bytes())
+    assert np.array_equal(restored.counts, h.counts)
+    assert (restored.count, restored.sum, restored.min, restored.max) == (h.count, h.sum, h.min, h.max)
+
+
+def test_merge_different_configurations():
+    with pytest.raises(ValueError):
+        WaitHistogram().merge(WaitHistogram(digits=2))
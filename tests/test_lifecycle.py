@@ -0,0 +1,66 @@
+import random
+
+import numpy as np
+import pytest
+import simpy
+
+from lifecycle import ARRIVAL, DOCK_GRANTED, EXIT, N_EVENTS, ShipLifecycleTable
+
+
+def fill(table: ShipLifecycleTable, n_ships: int, seed: int) -> dict:
+    """Open <n_ships> records, exiting them out of order, return the rows still in the system."""
+
+    rng = random.Random(seed)
+    env = table.env
+    departures = {} # row -> (step, ship id)
+    for i in range(n_ships):
+        env.run(until=i + 1)
+        row = table.open(i, -1 if i % 5 == 0 else 0)
+
+        # Some ships stay long, blocking the records behind them
+        departures[row] = (i + (40 if i % 50 == 0 else rng.randint(0, 5)), i)
+
+        for row, (step, _) in list(departures.items()):
+            if step <= i:
+                for event in range(DOCK_GRANTED, N_EVENTS):
+                    table.stamp(row, event, env.now + rng.uniform(0, 3) * event)
+                del departures[row]
+
+    return {row: ship_id for row, (_, ship_id) in departures.items()}
+
+
+def test_rows_valid_after_spill(tmp_path):
+    table = ShipLifecycleTable(simpy.Environment(), rows=8, spill_dir=str(tmp_path))
+    in_system = fill(table, 500, seed=0)
+
+    assert table.base > 0
+    assert len(table.ids) < 500
+
+    # Rows handed to ships still address their own records
+    for row, ship_id in in_system.items():
+        assert not table.exited(row)
+        assert table.time(row, ARRIVAL) == ship_id + 1
+        table.stamp(row, EXIT, 1000)
+        assert table.exited(row)
+
+    ids, _, times = table.records()
+    assert ids.tolist() == list(range(500))
+    assert (times[:, ARRIVAL] == np.arange(1, 501)).all()
+    assert not np.isnan(times[:, EXIT]).any()
+
+
+def test_spill_report_matches(tmp_path):
+    table = ShipLifecycleTable(simpy.Environment(), rows=8)
+    spilled = ShipLifecycleTable(simpy.Environment(), rows=8, spill_dir=str(tmp_path))
+    fill(table, 500, seed=1)
+    fill(spilled, 500, seed=1)
+    assert spilled.base > 0
+
+    report, spilled_report = table.report(), spilled.report()
+    assert report.keys() == spilled_report.keys()
+    for priority, segments in report.items():
+        assert segments.keys() == spilled_report[priority].keys()
+        for segment, (n, avg, *_) in segments.items():
+            spilled_n, spilled_avg, *_ = spilled_report[priority][segment]
+            assert spilled_n == n
+            assert spilled_avg == pytest.approx(avg)
@@ -0,0 +1,106 @@
+import random
+
+import pytest
+import simpy
+
+import main
+from objects.maintenance_scheduler import MaintenanceScheduler
+from objects.priority_filter_store import MyPriorityFilterStore
+from objects.tug import Tug
+from system_monitor import SystemMonitor
+
+
+@pytest.fixture
+def monitor(monkeypatch):
+    env = simpy.Environment()
+    am = SystemMonitor()
+    am.init(env, main.N_DOCKS, main.N_TUGS, main.N_FUEL_BARGES)
+    monkeypatch.setattr(main, 'am', am, raising=False)
+    yield am
+    am.close()
+
+
+@pytest.fixture
+def fleet(monitor):
+    """Pool of two tugs with no periodic maintenance."""
+
+    env = monitor.env
+    tugs = MyPriorityFilterStore(env, capacity=2)
+    scheduler = MaintenanceScheduler(env, tugs, monitor)
+    for id in range(2):
+        t = Tug(env, id)
+        scheduler.register(t, schedule=False)
+        tugs.put(t)
+    env.run(until=1)
+    return env, tugs, scheduler
+
+
+def test_fleet_invariant(monitor):
+    """Every tug is either idle, held by a ship or in maintenance."""
+
+    random.seed(3)
+    env = monitor.env
+    docks, tugs, fuel_barges = main.build_harbour(env, monitor)
+    env.process(main.ship_arrival(env, docks, tugs, fuel_barges))
+
+    maintenances = 0
+    while env.peek() < main.SIM_TIME:
+        env.step()
+        maintenances = max(maintenances, len(tugs.scheduler.in_maintenance))
+
+        # Check between time steps only, a tug is released and put back at the same time
+        if env.peek() > env.now and env.now > 0:
+            held = monitor.n_tugs_in_use
+            assert len(tugs.items) + held + len(tugs.scheduler.in_maintenance) == main.N_TUGS
+
+    assert maintenances > 0
+
+
+def test_take_out_and_bring_back(fleet):
+    env, tugs, scheduler = fleet
+
+    scheduler.take_out(0)
+    assert 0 in scheduler.in_maintenance
+    assert [t.id for t in tugs.items] == [1]
+
+    # External maintenance lasts until brought back
+    env.run(until=100)
+    assert 0 in scheduler.in_maintenance
+
+    scheduler.bring_back(0)
+    env.run(until=101)
+    assert 0 not in scheduler.in_maintenance
+    assert sorted(t.id for t in tugs.items) == [0, 1]
+
+
+def test_overdue_claimed_on_put(fleet):
+    env, tugs, scheduler = fleet
+    granted = []
+
+    def ship(priority):
+        tug = yield tugs.get(priority=priority)
+        granted.append((env.now, tug.id))
+        yield env.timeout(5)
+        yield tugs.put(tug)
+
+    # Both tugs held, then a ship waits
+    env.process(ship(0))
+    env.process(ship(0))
+    env.run(until=2)
+    env.process(ship(-1))
+    env.run(until=3)
+
+    # A held tug due for maintenance is not taken from its ship
+    scheduler.take_out(0)
+    assert scheduler.overdue == {0: True}
+    assert 0 not in scheduler.in_maintenance
+
+    # At release it goes in maintenance, the waiting ship gets the other tug
+    env.run(until=7)
+    assert 0 in scheduler.in_maintenance
+    assert granted[-1] == (6, 1)
+
+    scheduler.bring_back(0)
+    env.run(until=20)
+    assert scheduler.in_maintenance == {}
+    assert sorted(t.id for t in tugs.items) == [0, 1]
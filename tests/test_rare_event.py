@@ -0,0 +1,83 @@
+import math
+
+import numpy as np
+import pytest
+
+import main
+import rare_event
+
+
+class InlinePool:
+    """Runs the worker side in this process."""
+
+    def map(self, function, tasks):
+        return [function(task) for task in tasks]
+
+
+@pytest.fixture
+def short_horizon(monkeypatch):
+    # Over 24 hours the max. entrance wait is ~8.7 hours on average, std ~2.1,
+    # and at most ~37 ships wait at once on average, std ~10
+    monkeypatch.setattr(rare_event, 'RARE_HORIZON', 24)
+    monkeypatch.setattr(main, 'am', None, raising=False)
+
+
+def mean_and_half_width(samples: np.ndarray) -> tuple:
+    return samples.mean(), rare_event.confidence_half_width(samples, int(np.sum(samples > 0)))
+
+
+def test_student_t_quantile():
+    for dof, expected in [(1, 12.706), (2, 4.303), (4, 2.776), (9, 2.262), (999, 1.962)]:
+        assert rare_event.student_t_quantile(0.975, dof) == pytest.approx(expected, rel=1e-3)
+
+
+def test_importance_sampling_matches_crude(short_horizon, monkeypatch):
+    threshold = 12 # P ~ 0.05
+    base = main.SHIP_ARRIVAL_LAMBDA
+    window = rare_event.is_window(threshold)
+
+    crude = np.array([
+        rare_event.is_replication((base, window, seed))[0] >= threshold
+        for seed in range(300)], dtype=float)
+
+    monkeypatch.setattr(rare_event, 'IS_CE_RUNS', 100)
+    tilted, reached = rare_event.cross_entropy_tilt(InlinePool(), threshold)
+    assert reached and tilted > base
+
+    # Defensive mixture: the first runs keep the nominal rate
+    runs, nominal = 200, 20
+    results = np.array([
+        rare_event.is_replication((base if i < nominal else tilted, window, 1000 + i))
+        for i in range(runs)])
+    waits, n, exposure = results.T
+    weights = rare_event.mixture_weights(n, exposure, tilted, nominal / runs)
+    assert weights.max() <= runs / nominal
+
+    crude_p, crude_half_width = mean_and_half_width(crude)
+    is_p, is_half_width = mean_and_half_width((waits >= threshold) * weights)
+    assert abs(is_p - crude_p) < math.hypot(crude_half_width, is_half_width)
+
+
+def test_splitting_matches_crude(short_horizon, monkeypatch):
+    target = 54 # P ~ 0.05
+
+    # Without levels, trajectories run to the horizon
+    crude = np.array([
+        waiting >= target
+        for seed in range(300)
+        for _, waiting in rare_event.splitting_run(([], [], math.inf, seed))], dtype=float)
+
+    monkeypatch.setattr(rare_event, 'SPLITTING_DRIFT', 1.5) # ~37 ships waiting in 24 hours
+    monkeypatch.setattr(rare_event, 'SPLITTING_PILOT_RUNS', 30)
+    levels, factors = rare_event.splitting_levels(InlinePool(), target)
+    assert len(levels) == len(factors) > 0
+
+    # Estimates of the trees of independent trajectories
+    trees = InlinePool().map(
+        rare_event.splitting_run, [(levels, factors, target, seed) for seed in range(1000, 1100)])
+    estimates = np.array([
+        sum(waiting >= target for _, waiting in peaks) for peaks in trees]) / math.prod(factors)
+
+    crude_p, crude_half_width = mean_and_half_width(crude)
+    splitting_p, splitting_half_width = mean_and_half_width(estimates)
+    assert abs(splitting_p - crude_p) < math.hypot(crude_half_width, splitting_half_width)
@@ -0,0 +1,123 @@
+import asyncio
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import simpy
+
+import main
+import twin
+from histogram import merge_histograms
+from lifecycle import BUNKERING_DONE, CARGO_DONE, DOCKING_DONE, TUG_GRANTED
+from objects.ship import Ship, SpecialShip
+from system_monitor import SystemMonitor
+
+
+@pytest.fixture
+def harbour_twin(monkeypatch):
+    """Twin fed with a burst of arrivals, then advanced for a few hours."""
+
+    monkeypatch.setattr(main, 'am', None, raising=False)
+    monkeypatch.setattr(twin, 'TWIN_TIME_FACTOR', 1e-6)
+    t = twin.HarbourTwin(pool=None)
+
+    # Half of the ships arrive with a full tank
+    for i in range(40):
+        ship_class = Ship if i % 5 else SpecialShip
+        s = ship_class(i, 100_000, 100_000 if i % 2 else 50_000)
+        main.ship_arrived(t.env, s, t.docks, t.tugs, t.fuel_barges)
+        t.ships[s.record] = s
+
+    t.env.run(until=3.5)
+    yield t
+    t.monitor.close()
+
+
+def test_snapshot(harbour_twin):
+    snapshot = harbour_twin.snapshot()
+    stages = {stage for *_, stage, _ in snapshot['ships']}
+    assert {twin.ENTRANCE, twin.BERTHED} <= stages
+
+    for *_, stage, times in snapshot['ships']:
+        if stage == twin.BERTHED:
+            assert not math.isnan(times[DOCKING_DONE])
+        if stage == twin.DOCKING:
+            assert not math.isnan(times[TUG_GRANTED]) and math.isnan(times[DOCKING_DONE])
+
+
+def test_forecast_replication(harbour_twin, monkeypatch):
+    snapshot = harbour_twin.snapshot()
+
+    # Berthed ships already bunkered (full tank) resume without a barge
+    assert any(
+        stage == twin.BERTHED and not math.isnan(times[BUNKERING_DONE])
+        and math.isnan(times[CARGO_DONE])
+        for *_, stage, times in snapshot['ships'])
+
+    monkeypatch.setattr(main, 'am', None, raising=False)
+    histograms, censored = twin.forecast_replication(snapshot, horizon=12, seed=1)
+
+    # Every ship waiting at the snapshot is counted, served or censored
+    waiting = sum(stage == twin.ENTRANCE for *_, stage, _ in snapshot['ships'])
+    h = merge_histograms([histograms[None]])
+    assert len(h) >= waiting
+    assert 0 <= censored <= len(h)
+    assert h.percentile(50) > 0
+
+
+def test_forecast_reports_failures(harbour_twin, monkeypatch):
+    def failing(snapshot, horizon, seed, deadline):
+        raise RuntimeError('boom')
+
+    monkeypatch.setattr(twin, 'forecast_replication', failing)
+    with ThreadPoolExecutor(2) as pool:
+        harbour_twin.pool = pool
+        reply = asyncio.run(harbour_twin.forecast(12, 4))
+
+    assert reply['ok'] is False
+    assert reply['replications'] == 0
+    assert reply['failed'] == 4
+    assert reply['errors'] == ['RuntimeError: boom']
+
+
+def test_restore_closing_dock_after_ships(harbour_twin, monkeypatch):
+    # All docks are held by ships, a dock closes once its ship leaves
+    assert harbour_twin.docks.count == main.N_DOCKS
+    monkeypatch.setattr(harbour_twin, 'advance', lambda: None)
+    asyncio.run(harbour_twin.handle_event({'type': 'dock', 'id': 0, 'status': 'closed'}))
+    snapshot = harbour_twin.snapshot()
+    assert (snapshot['closed_docks'], snapshot['closing_docks']) == (0, 1)
+
+    monkeypatch.setattr(main, 'am', None, raising=False)
+    am = SystemMonitor()
+    env = simpy.Environment()
+    am.init(env, main.N_DOCKS, main.N_TUGS, main.N_FUEL_BARGES)
+    main.am = am
+    docks, tugs, fuel_barges = main.build_harbour(env, am, maintenance=False)
+    twin.restore_state(env, snapshot, docks, tugs, fuel_barges)
+    env.run(until=1e-6)
+
+    # Every ship at dock gets its dock back, the closing dock waits
+    in_system = sum(stage != twin.EXITING for *_, stage, _ in snapshot['ships'])
+    assert am.n_ships_system == in_system
+    assert docks.queue[0].priority == twin.RESTORE_PRIORITY
+    am.close()
+
+
+def test_replication_stops_at_deadline(harbour_twin, monkeypatch):
+    snapshot = harbour_twin.snapshot()
+    monkeypatch.setattr(main, 'am', None, raising=False)
+    with pytest.raises(TimeoutError):
+        twin.forecast_replication(snapshot, horizon=12, seed=1, deadline=time.time() - 1)
+
+
+def test_forecast_reports_timeouts(harbour_twin, monkeypatch):
+    monkeypatch.setattr(twin, 'FORECAST_TIMEOUT', 0)
+    with ThreadPoolExecutor(1) as pool:
+        harbour_twin.pool = pool
+        reply = asyncio.run(harbour_twin.forecast(12, 4))
+
+    assert reply['ok'] is False
+    assert reply['timed_out'] == 4
+    assert reply['failed'] == 0